@@ -4,3 +4,5 @@ from enum import StrEnum
 class ChannelGroup(StrEnum):
     NOTIFICATION = 'notification_v1'
     PERSONAL = 'user_v1_{}'
+    COURSE = 'course_v1_{}'
+    COURSE_STAFF = 'course_staff_v1_{}'
@@ -1,8 +1,10 @@
 import json
 
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 
 from .constants import ChannelGroup
+from .notifications import get_course_groups
 
 
 class NotificationConsumer(AsyncWebsocketConsumer):
@@ -11,14 +13,23 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         user = self.scope['user']
         if user.is_authenticated:
             self.personal_group = ChannelGroup.PERSONAL.format(user.id)
-            self.public_groups = [ChannelGroup.NOTIFICATION]
-            self.groups = [*self.public_groups, self.personal_group]
-            for group in self.groups:
-                await self.channel_layer.group_add(group, self.channel_name)
+            self.groups = [self.personal_group]
+            await self.channel_layer.group_add(self.personal_group, self.channel_name)
+            await self.update_course_groups()
             await self.accept()
         else:
             await self.close()
 
+    async def update_course_groups(self):
+        """Subscribes the socket to groups of courses the user teaches or attends."""
+        course_groups = await database_sync_to_async(get_course_groups)(self.scope['user'].id)
+        current_groups = set(self.groups) - {self.personal_group}
+        for group in current_groups - course_groups:
+            await self.channel_layer.group_discard(group, self.channel_name)
+        for group in course_groups - current_groups:
+            await self.channel_layer.group_add(group, self.channel_name)
+        self.groups = [self.personal_group, *course_groups]
+
     async def disconnect(self, close_code):
         for group in self.groups:
             await self.channel_layer.group_discard(group, self.channel_name)
@@ -31,3 +42,6 @@ class NotificationConsumer(AsyncWebsocketConsumer):
     async def get_message(self, event):
         message = event['message']
         await self.send(text_data=message)
+
+    async def courses_changed(self, event):
+        await self.update_course_groups()
@@ -16,7 +16,7 @@ class ServerWebSocketMessageSerializer(serializers.Serializer):
     object_name = serializers.ChoiceField(
         choices=[klass.Meta.api_object_name for klass in NotificationSenderV1.serializers_map.values()]
     )
-    obj = serializers.DictField()
+    obj = serializers.JSONField(help_text="An object, or a list of objects for `bulk_create` event.")
 
 
 class NotificationWebSocketDocsView(APIView):
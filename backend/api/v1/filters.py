@@ -1,6 +1,9 @@
+from django.db.models import Exists, OuterRef, Q
 from django_filters import rest_framework as filters
 from django_filters.rest_framework import BooleanFilter, DateTimeFromToRangeFilter
 
+from courses.models import Submission
+
 
 class HomeWorkFilter(filters.FilterSet):
     """FilterSet for HomeWork model."""
@@ -9,16 +12,28 @@ class HomeWorkFilter(filters.FilterSet):
     isgraded = BooleanFilter(method="filter_by_is_graded")
     issubmitted = BooleanFilter(method="filter_by_is_submitted")
 
+    def is_teacher(self) -> bool:
+        user = getattr(self.request, "user", None)
+        return user is None or user.role == "TEACHER"
+
+    def get_own_submissions(self):
+        """Submissions of the homework by the student."""
+        return Submission.objects.filter(homework=OuterRef("pk"), author=self.request.user)
+
     def filter_by_is_graded(self, queryset, name, value):
         """
         Filters homeworks based on whether they have a grade.
 
         - `isgraded=true`: returns homeworks that have at least one graded submission.
         - `isgraded=false`: returns homeworks that have no graded submissions.
+
+        Teachers see all submissions, so their counter is enough.
         """
-        if value:
-            return queryset.filter(submissions__grade__isnull=False).distinct()
-        return queryset.exclude(submissions__grade__isnull=False)
+        if self.is_teacher():
+            graded = Q(graded_count__gt=0)
+        else:
+            graded = Exists(self.get_own_submissions().filter(grade__isnull=False))
+        return queryset.filter(graded if value else ~graded)
 
     def filter_by_is_submitted(self, queryset, name, value):
         """
@@ -27,6 +42,5 @@ class HomeWorkFilter(filters.FilterSet):
         - `issubmitted=true`: returns homeworks that have at least one submission.
         - `issubmitted=false`: returns homeworks that have no submissions.
         """
-        if value:
-            return queryset.filter(submissions__isnull=False).distinct()
-        return queryset.exclude(submissions__isnull=False)
+        submitted = Q(submission_count__gt=0) if self.is_teacher() else Exists(self.get_own_submissions())
+        return queryset.filter(submitted if value else ~submitted)
@@ -1,6 +1,9 @@
 import typing
 
+from django.db import transaction
+
 from api.v1.constants import ChannelGroup
+from courses.membership import get_course_membership, get_user_courses
 from courses.models import Comment, Course, Grade, HomeWork, Lecture, Submission
 from courses.serializers import (
     CommentSerializer,
@@ -10,7 +13,28 @@ from courses.serializers import (
     LectureSerializer,
     SubmissionSerializer,
 )
-from project.notifications import NotificationSender
+from project.constants import EventEnum
+from project.notifications import BulkNotificationSender, NotificationSender, dispatcher
+
+
+def get_course_groups(user_id: int) -> set[str]:
+    """Returns course groups a user's socket should be subscribed to."""
+    user_courses = get_user_courses(user_id)
+    return {
+        *(ChannelGroup.COURSE.format(course_id) for course_id in user_courses.course_ids),
+        *(ChannelGroup.COURSE_STAFF.format(course_id) for course_id in user_courses.staff_course_ids),
+    }
+
+
+def notify_courses_changed(user_ids):
+    """Asks sockets of the users to resubscribe to course groups after commit."""
+
+    def enqueue():
+        for user_id in user_ids:
+            message = {"type": "courses.changed"}
+            dispatcher.enqueue(("courses.changed", user_id), [(ChannelGroup.PERSONAL.format(user_id), message)])
+
+    transaction.on_commit(enqueue, robust=True)
 
 
 class NotificationSenderV1(NotificationSender):
@@ -24,3 +48,40 @@ class NotificationSenderV1(NotificationSender):
         Grade: GradeSerializer,
         Comment: CommentSerializer,
     }
+    course_lookups: typing.ClassVar = {
+        Course: "pk",
+        Lecture: "course_id",
+        HomeWork: "lecture__course_id",
+        Submission: "homework__lecture__course_id",
+        Grade: "submission__homework__lecture__course_id",
+        Comment: "grade__submission__homework__lecture__course_id",
+    }
+    # Objects of a single student are sent to the student and course staff only.
+    owner_lookups: typing.ClassVar = {
+        Submission: "author_id",
+        Grade: "submission__author_id",
+        Comment: "grade__submission__author_id",
+    }
+
+    def _lookup(self, path: str):
+        # Objects created in bulk share the parent, the first one is enough.
+        instance = self.instance[0] if isinstance(self.instance, list) else self.instance
+        if "__" not in path:
+            return getattr(instance, path)
+        return self.model.objects.filter(pk=instance.pk).values_list(path, flat=True).first()
+
+    def get_groups(self) -> list[str]:
+        model = self.model
+        course_id = self._lookup(self.course_lookups[model])
+        if model in self.owner_lookups:
+            owner_id = self._lookup(self.owner_lookups[model])
+            return [ChannelGroup.COURSE_STAFF.format(course_id), ChannelGroup.PERSONAL.format(owner_id)]
+        if model is Course and self.event == EventEnum.CREATE:
+            # Members have not joined the group of a new course yet.
+            membership = get_course_membership(course_id)
+            return [ChannelGroup.PERSONAL.format(user_id) for user_id in membership.user_ids]
+        return [ChannelGroup.COURSE.format(course_id)]
+
+
+class BulkNotificationSenderV1(BulkNotificationSender, NotificationSenderV1):
+    """Sends objects created by one `bulk/` request as a single notification."""
@@ -0,0 +1,177 @@
+import hashlib
+from functools import cached_property, partial
+
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Page
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+PAGE_COUNT_KEY = "page_count:{}:{}"
+
+
+class CountedPaginator(DjangoPaginator):
+    """
+    Django paginator which gets the count from `get_count`.
+
+    A count may be outdated, so pages past it are checked again with `recount`.
+    """
+
+    def __init__(self, object_list, per_page, get_count, recount, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.get_count = get_count
+        self.recount = recount
+
+    @cached_property
+    def count(self):
+        return self.get_count(self.object_list)
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if self.recount is None:
+                raise
+        self.count = self.recount(self.object_list)
+        self.recount = None
+        self.__dict__.pop("num_pages", None)
+        return super().validate_number(number)
+
+
+class CachedCountPagination(PageNumberPagination):
+    """
+    Page numbers with a cheaper `count`, chosen by `?count=`.
+
+    - `cached` (default): `COUNT(*)` cached for `count_timeout` seconds per user and query string.
+    - `exact`: `COUNT(*)` of every request.
+    - `estimate`: row estimate of the planner, cached count for small results.
+    - `false`: no count, `next` is found by fetching one extra row.
+
+    Pages past a cached or estimated count are counted again, so new pages are found.
+    """
+
+    count_query_param = "count"
+    count_timeout = 30
+    estimate_exact_below = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_mode = request.query_params.get(self.count_query_param, "cached")
+        if self.count_mode == "false":
+            return self.paginate_without_count(queryset, request)
+        if self.count_mode == "exact":
+            get_count, recount = lambda queryset: queryset.count(), None
+        else:
+            get_count = self.get_estimated_count if self.count_mode == "estimate" else self.get_cached_count
+            get_count = partial(get_count, request=request)
+            recount = partial(self.get_cached_count, request=request, refresh=True)
+        self.django_paginator_class = partial(CountedPaginator, get_count=get_count, recount=recount)
+        return super().paginate_queryset(queryset, request, view)
+
+    def paginate_without_count(self, queryset, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        try:
+            number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            number = 0
+        if number < 1:
+            raise NotFound(self.invalid_page_message.format(page_number=number, message="Invalid page."))
+        offset = (number - 1) * page_size
+        rows = list(queryset[offset : offset + page_size + 1])
+        if not rows and number > 1:
+            raise NotFound(self.invalid_page_message.format(page_number=number, message="That page is empty."))
+        paginator = DjangoPaginator(queryset, page_size)
+        # A lower bound, it is enough for the paginator to know if there is a next page.
+        paginator.count = offset + len(rows)
+        self.page = Page(rows[:page_size], number, paginator)
+        return list(self.page)
+
+    def get_cached_count(self, queryset, request, refresh: bool = False) -> int:
+        query = sorted(
+            (key, value)
+            for key, value in request.query_params.lists()
+            if key not in (self.page_query_param, self.count_query_param)
+        )
+        digest = hashlib.md5(f"{request.path}?{query}".encode(), usedforsecurity=False).hexdigest()
+        key = PAGE_COUNT_KEY.format(request.user.pk, digest)
+        if not refresh:
+            return cache.get_or_set(key, queryset.count, self.count_timeout)
+        count = queryset.count()
+        cache.set(key, count, self.count_timeout)
+        return count
+
+    def get_estimated_count(self, queryset, request) -> int:
+        sql, params = queryset.query.sql_with_params()
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        estimate = plan[0]["Plan"]["Plan Rows"]
+        if estimate < self.estimate_exact_below:
+            return self.get_cached_count(queryset, request)
+        return estimate
+
+    def get_paginated_response(self, data):
+        if self.count_mode != "false":
+            return super().get_paginated_response(data)
+        return Response({"next": self.get_next_link(), "previous": self.get_previous_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["required"] = ["results"]
+        return response_schema
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            *super().get_schema_operation_parameters(view),
+            {
+                "name": self.count_query_param,
+                "required": False,
+                "in": "query",
+                "description": "How to count results: `cached` (default), `exact`, `estimate` or `false`.",
+                "schema": {"type": "string", "enum": ["cached", "exact", "estimate", "false"]},
+            },
+        ]
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset pagination on `id`, a page costs the same no matter how deep it is.
+
+    Page numbers are still available as opt-in, pass `?page=` to get them.
+    """
+
+    ordering = "id"
+    page_number_class = PageNumberPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.page_number_class.page_query_param in request.query_params:
+            self.page_number = self.page_number_class()
+            return self.page_number.paginate_queryset(queryset, request, view)
+        self.page_number = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.page_number is not None:
+            return self.page_number.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.page_number is not None:
+            return self.page_number.to_html()
+        return super().to_html()
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            *super().get_schema_operation_parameters(view),
+            *self.page_number_class().get_schema_operation_parameters(view),
+        ]
+
+
+class CachedCountIdCursorPagination(IdCursorPagination):
+    """Keyset pagination with page numbers counted by `CachedCountPagination`."""
+
+    page_number_class = CachedCountPagination
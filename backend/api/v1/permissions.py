@@ -1,8 +1,5 @@
-from django.shortcuts import get_object_or_404
 from rest_framework import permissions
 
-from courses.models import Course, Lecture, Submission
-
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
     """
@@ -17,7 +14,8 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return getattr(obj, self.owner_field) == request.user
+        owner_attname = obj._meta.get_field(self.owner_field).attname
+        return getattr(obj, owner_attname) == request.user.id
 
 
 class IsTeaacher(permissions.BasePermission):
@@ -53,9 +51,7 @@ class CanAddLecture(permissions.BasePermission):
     def has_permission(self, request, view):
         if request.method in permissions.SAFE_METHODS:
             return True
-        course_id = view.kwargs["course_id"]
-        course = get_object_or_404(Course, id=course_id)
-        return bool(course.author == request.user or course.teachers.filter(id=request.user.id).exists())
+        return view.course_membership.is_staff(request.user.id)
 
 
 class CanAddHomeWork(permissions.BasePermission):
@@ -64,9 +60,8 @@ class CanAddHomeWork(permissions.BasePermission):
     def has_permission(self, request, view):
         if request.method in permissions.SAFE_METHODS:
             return True
-        lecture_id = view.kwargs["lecture_id"]
-        lecture = get_object_or_404(Lecture, id=lecture_id)
-        return bool(lecture.teacher == request.user)
+        lecture = view.get_parent("lecture_id")
+        return bool(lecture.teacher_id == request.user.id)
 
 
 class CanAddReadComment(permissions.BasePermission):
@@ -75,9 +70,8 @@ class CanAddReadComment(permissions.BasePermission):
     def has_permission(self, request, view):
         if request.user.role == "TEACHER":
             return True
-        grade_id = view.kwargs.get("grade_id")
-        submission = get_object_or_404(Submission, pk=grade_id)
-        return bool(submission.author == request.user)
+        grade = view.get_parent("grade_id")
+        return bool(grade.submission.author_id == request.user.id)
 
 
 def get_owner_permission_class(field_name: str):
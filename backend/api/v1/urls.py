@@ -6,6 +6,7 @@ from .views import (
     CommentViewSet,
     CourseViewSet,
     GradeViewSet,
+    HomeWorkGradeViewSet,
     HomeWorkSubmissionViewSet,
     LectureHomeWorkViewSet,
     LectureViewSet,
@@ -41,6 +42,16 @@ urlpatterns = [
         ),
         name="submission-grade",
     ),
+    path(
+        "homeworks/<int:homework_id>/grades/",
+        HomeWorkGradeViewSet.as_view({"post": "create"}),
+        name="homework-grades",
+    ),
+    re_path(
+        r"^courses/(?P<pk>\d+)/gradebook\.(?P<export_format>csv|ndjson)$",
+        CourseViewSet.as_view({"get": "gradebook"}),
+        name="course-gradebook",
+    ),
     path("", include(router.urls)),
     path("notifications/", NotificationWebSocketDocsView.as_view(), name="ws"),
 ]
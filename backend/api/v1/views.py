@@ -1,17 +1,36 @@
-from django.db.models import Prefetch
-from django.shortcuts import get_object_or_404
+from functools import cached_property
+
+from django.conf import settings
+from django.http import Http404, StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet, ModelViewSet, mixins
 
-from core.views import ServiceViewMixin
+from core.prefetch import prefetch_for_serializer
+from core.views import (
+    BulkCreateMixin,
+    CachedResponseMixin,
+    ConditionalGetMixin,
+    ParentObjectMixin,
+    QueryBudgetMixin,
+    SerializerPrefetchMixin,
+    ServiceViewMixin,
+)
+from courses.gradebook import EXPORT_FORMATS, get_gradebook_rows
+from courses.membership import get_course_membership, get_user_courses, member_count, member_ids
 from courses.models import Course, Grade, HomeWork, Lecture, Submission
 from courses.serializers import (
     CommentSerializer,
+    CourseListSerializer,
     CourseSerializer,
+    GradeBulkSerializer,
     GradeSerializer,
     HomeWorkSerializer,
+    LectureBulkSerializer,
     LectureSerializer,
     MyHomeWorkSerializer,
     SubmissionSerializer,
@@ -24,8 +43,11 @@ from courses.services import (
     LectureService,
     SubmissionService,
 )
+from courses.stats import get_course_stats
+from courses.versions import COURSE_LIST_VERSION_KEY, COURSE_VERSION_KEY
 
 from .filters import HomeWorkFilter
+from .pagination import CachedCountIdCursorPagination, IdCursorPagination
 from .permissions import (
     CanAddHomeWork,
     CanAddLecture,
@@ -36,15 +58,89 @@ from .permissions import (
 )
 
 
-class CourseViewSet(ServiceViewMixin, ModelViewSet):
+class CourseViewSet(QueryBudgetMixin, CachedResponseMixin, ConditionalGetMixin, ServiceViewMixin, ModelViewSet):
     permission_classes = (permissions.IsAuthenticated, IsTeaacherOrReadOnly, get_owner_permission_class("author"))
-    queryset = Course.objects.prefetch_related("teachers", "students")
+    queryset = Course.objects.all()
     serializer_class = CourseSerializer
+    query_budget = {
+        "list": 3,
+        "retrieve": 3,
+        "stats": 4,
+        "gradebook": 2,
+        "create": 16,
+        "partial_update": 19,
+        "destroy": 11,
+    }
     http_method_names = ("get", "post", "patch", "delete")
     service_class = CourseService
 
+    @cached_property
+    def expand(self) -> set[str]:
+        names = self.request.query_params.get("expand", "").split(",")
+        return set(names) & CourseListSerializer.expandable_fields.keys()
+
+    def get_queryset(self):
+        serializer = self.get_serializer()
+        if self.action != "list":
+            return prefetch_for_serializer(
+                super().get_queryset(), serializer, only=self.request.method in permissions.SAFE_METHODS
+            )
+        annotations = {
+            "teacher_count": member_count(Course.teachers),
+            "student_count": member_count(Course.students),
+            "teacher_ids": member_ids(Course.teachers),
+            "student_ids": member_ids(Course.students),
+        }
+        sources = {field.source for field in serializer.fields.values()}
+        return Course.objects.values(*(sources - annotations.keys())).annotate(
+            **{name: annotation for name, annotation in annotations.items() if name in sources}
+        )
 
-class LectureViewSet(ServiceViewMixin, ModelViewSet):
+    def get_serializer_class(self):
+        if self.action == "list":
+            return CourseListSerializer
+        return super().get_serializer_class()
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), "expand": self.expand}
+
+    def get_cache_version_keys(self):
+        if self.action == "list":
+            return [COURSE_LIST_VERSION_KEY]
+        return [COURSE_VERSION_KEY.format(self.kwargs["pk"])]
+
+    def get_staff_membership(self):
+        """Membership of the course from the URL, if the user is its author or teacher."""
+        membership = get_course_membership(self.kwargs["pk"])
+        if membership is None:
+            raise Http404
+        if not membership.is_staff(self.request.user.id):
+            raise PermissionDenied("You are not assigned to this course.")
+        return membership
+
+    def gradebook(self, request, pk, export_format):
+        """Streams submissions and grades of the course, available to the author and teachers."""
+        membership = self.get_staff_membership()
+        stream, content_type = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(stream(get_gradebook_rows(membership.course_id)), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="course-{pk}-gradebook.{export_format}"'
+        return response
+
+    @action(detail=True, methods=["get"])
+    def stats(self, request, pk=None):
+        """Score distributions and submission rates of homeworks and students, available to the author and teachers."""
+        return Response(get_course_stats(self.get_staff_membership()))
+
+
+class LectureViewSet(
+    QueryBudgetMixin,
+    CachedResponseMixin,
+    ConditionalGetMixin,
+    BulkCreateMixin,
+    SerializerPrefetchMixin,
+    ServiceViewMixin,
+    ModelViewSet,
+):
     """ViewSet for lectures. multipart/form-data."""
 
     permission_classes = (
@@ -53,23 +149,42 @@ class LectureViewSet(ServiceViewMixin, ModelViewSet):
         CanAddLecture,
     )
     serializer_class = LectureSerializer
+    query_budget = {"list": 4, "retrieve": 2, "create": 6, "bulk_create": 6, "partial_update": 6, "destroy": 7}
+    bulk_serializer_class = LectureBulkSerializer
     parser_classes = (MultiPartParser,)
     http_method_names = ("get", "post", "patch", "delete")
     service_class = LectureService
 
+    @cached_property
+    def course_membership(self):
+        membership = get_course_membership(self.kwargs.get("course_id"))
+        if membership is None:
+            raise Http404
+        return membership
+
     def get_queryset(self):
-        course_id = self.kwargs.get("course_id")
-        course = get_object_or_404(Course, id=course_id)
-        return course.lectures.all()
+        return Lecture.objects.filter(course_id=self.course_membership.course_id)
 
     def perform_create(self, serializer):
-        course_id = self.kwargs.get("course_id")
-        course = get_object_or_404(Course, id=course_id)
         service = self.get_service()
-        serializer.instance = service.create(course=course, **serializer.validated_data)
+        serializer.instance = service.create(course_id=self.course_membership.course_id, **serializer.validated_data)
+
+    def get_bulk_create_kwargs(self):
+        return {"course_id": self.course_membership.course_id}
+
+    def get_cache_version_keys(self):
+        return [COURSE_VERSION_KEY.format(self.kwargs["course_id"])]
 
 
-class LectureHomeWorkViewSet(ServiceViewMixin, ModelViewSet):
+class LectureHomeWorkViewSet(
+    QueryBudgetMixin,
+    ConditionalGetMixin,
+    BulkCreateMixin,
+    SerializerPrefetchMixin,
+    ParentObjectMixin,
+    ServiceViewMixin,
+    ModelViewSet,
+):
     """ViewSet for homeworks."""
 
     permission_classes = (
@@ -79,57 +194,81 @@ class LectureHomeWorkViewSet(ServiceViewMixin, ModelViewSet):
         get_owner_permission_class("author"),
     )
     serializer_class = HomeWorkSerializer
+    query_budget = {"list": 4, "retrieve": 2, "create": 5, "bulk_create": 5, "partial_update": 6, "destroy": 7}
     http_method_names = ("get", "post", "patch", "delete")
     service_class = HomeWorkService
+    conditional_fields = ("submission_count", "graded_count")
+    parent_lookups = {"lecture_id": Lecture.objects.only("id", "teacher_id")}
 
     def get_queryset(self):
-        lecture_id = self.kwargs.get("lecture_id")
-        lecture = get_object_or_404(Lecture, id=lecture_id)
+        lecture = self.get_parent("lecture_id")
         return lecture.homeworks.all()
 
     def perform_create(self, serializer):
-        lecture_id = self.kwargs.get("lecture_id")
-        lecture = get_object_or_404(Lecture, id=lecture_id)
+        lecture = self.get_parent("lecture_id")
         service = self.get_service()
         serializer.instance = service.create(lecture=lecture, **serializer.validated_data)
 
+    def get_bulk_create_kwargs(self):
+        return {"lecture": self.get_parent("lecture_id")}
 
-class HomeWorkSubmissionViewSet(ServiceViewMixin, ModelViewSet):
+
+class HomeWorkSubmissionViewSet(
+    QueryBudgetMixin,
+    ConditionalGetMixin,
+    BulkCreateMixin,
+    SerializerPrefetchMixin,
+    ParentObjectMixin,
+    ServiceViewMixin,
+    ModelViewSet,
+):
     """ViewSet for submissions."""
 
     permission_classes = (permissions.IsAuthenticated, IsStudentrOrReadOnly, get_owner_permission_class("author"))
     serializer_class = SubmissionSerializer
+    query_budget = {"list": 4, "retrieve": 3, "create": 9, "bulk_create": 8, "partial_update": 6, "destroy": 10}
+    pagination_class = IdCursorPagination
+    conditional_relations = ("grade",)
     http_method_names = ("get", "post", "patch", "delete")
     service_class = SubmissionService
+    parent_lookups = {"homework_id": HomeWork.objects.only("id")}
 
     def get_queryset(self):
-        homework_id = self.kwargs.get("homework_id")
-        homework = get_object_or_404(HomeWork, id=homework_id)
-        queryset = homework.submissions.select_related("grade")
+        homework = self.get_parent("homework_id")
         if self.request.user.role == "TEACHER":
-            return queryset.all()
-        return queryset.filter(author=self.request.user)
+            return homework.submissions.all()
+        return homework.submissions.filter(author=self.request.user)
 
     def perform_create(self, serializer):
-        homework_id = self.kwargs.get("homework_id")
-        homework = get_object_or_404(HomeWork, id=homework_id)
+        homework = self.get_parent("homework_id")
         service = self.get_service()
         serializer.instance = service.create(homework=homework, **serializer.validated_data)
 
+    def get_bulk_create_kwargs(self):
+        return {"homework": self.get_parent("homework_id")}
+
 
-class GradeViewSet(ServiceViewMixin, mixins.CreateModelMixin, mixins.UpdateModelMixin, GenericViewSet):
+class GradeViewSet(
+    QueryBudgetMixin,
+    ParentObjectMixin,
+    ServiceViewMixin,
+    mixins.CreateModelMixin,
+    mixins.UpdateModelMixin,
+    GenericViewSet,
+):
     """ViewSet for creating/changing grades."""
 
     permission_classes = (permissions.IsAuthenticated, IsTeaacherOrReadOnly, get_owner_permission_class("author"))
     serializer_class = GradeSerializer
+    query_budget = {"create": 8, "partial_update": 5}
     lookup_field = "submission_id"
     queryset = Grade.objects.all()
     http_method_names = ("post", "patch")
     service_class = GradingService
+    parent_lookups = {"submission_id": Submission.objects.only("id")}
 
     def perform_create(self, serializer):
-        submission_id = self.kwargs.get("submission_id")
-        submission = get_object_or_404(Submission, id=submission_id)
+        submission = self.get_parent("submission_id")
         grading_service = self.get_service()
         grading_service.create(
             submission=submission,
@@ -137,44 +276,77 @@ class GradeViewSet(ServiceViewMixin, mixins.CreateModelMixin, mixins.UpdateModel
         )
 
 
-class MyHomeWorkViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, GenericViewSet):
+class HomeWorkGradeViewSet(QueryBudgetMixin, ParentObjectMixin, ServiceViewMixin, GenericViewSet):
+    """ViewSet for grading submissions of a homework with one request."""
+
+    permission_classes = (permissions.IsAuthenticated, IsTeaacherOrReadOnly)
+    serializer_class = GradeBulkSerializer
+    query_budget = {"create": 10}
+    http_method_names = ("post",)
+    service_class = GradingService
+    parent_lookups = {"homework_id": HomeWork.objects.only("id")}
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(
+            data=request.data, many=True, allow_empty=False, max_length=settings.BULK_CREATE_MAX_SIZE
+        )
+        serializer.is_valid(raise_exception=True)
+        grading_service = self.get_service()
+        result = grading_service.bulk_upsert(self.get_parent("homework_id"), serializer.validated_data)
+        return Response(result)
+
+
+class MyHomeWorkViewSet(
+    QueryBudgetMixin,
+    ConditionalGetMixin,
+    SerializerPrefetchMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    GenericViewSet,
+):
     """ViewSet for my homeworks."""
 
     permission_classes = (permissions.IsAuthenticated,)
     serializer_class = MyHomeWorkSerializer
+    query_budget = {"list": 5, "retrieve": 5}
+    pagination_class = CachedCountIdCursorPagination
+    conditional_relations = ("submissions", "submissions__grade")
     queryset = HomeWork.objects.all()
     filter_backends = (DjangoFilterBackend,)
     filterset_class = HomeWorkFilter
 
     def get_queryset(self):
+        queryset = super().get_queryset()
         if self.request.user.role == "TEACHER":
-            return super().get_queryset().filter(author=self.request.user).prefetch_related("submissions")
-        return (
-            super()
-            .get_queryset()
-            .filter(lecture__course__students=self.request.user)
-            .prefetch_related(Prefetch("submissions", Submission.objects.filter(author=self.request.user)))
-        )
+            return queryset.filter(author=self.request.user)
+        return queryset.filter(lecture__course_id__in=get_user_courses(self.request.user.id).student_course_ids)
+
+    def get_prefetch_querysets(self):
+        if self.request.user.role == "TEACHER":
+            return {}
+        return {"submissions": Submission.objects.filter(author=self.request.user)}
 
 
-class CommentViewSet(ServiceViewMixin, ModelViewSet):
+class CommentViewSet(
+    QueryBudgetMixin, ConditionalGetMixin, SerializerPrefetchMixin, ParentObjectMixin, ServiceViewMixin, ModelViewSet
+):
     """ViewSet for comments."""
 
     permission_classes = (permissions.IsAuthenticated, CanAddReadComment, get_owner_permission_class("author"))
     serializer_class = CommentSerializer
+    query_budget = {"list": 3, "retrieve": 2, "create": 5, "partial_update": 6, "destroy": 6}
+    pagination_class = IdCursorPagination
     http_method_names = ("get", "post", "patch", "delete")
     service_class = CommentService
+    parent_lookups = {"grade_id": Grade.objects.select_related("submission").only("submission__author_id")}
 
     def get_queryset(self):
-        grade_id = self.kwargs.get("grade_id")
-        if self.request.user.role == "TEACHER":
-            grade = get_object_or_404(Grade, pk=grade_id)
-        else:
-            grade = get_object_or_404(Grade, pk=grade_id, submission__author=self.request.user)
+        grade = self.get_parent("grade_id")
+        if self.request.user.role != "TEACHER" and grade.submission.author_id != self.request.user.id:
+            raise Http404
         return grade.comments.all()
 
     def perform_create(self, serializer):
-        grade_id = self.kwargs.get("grade_id")
-        grade = get_object_or_404(Grade, pk=grade_id)
+        grade = self.get_parent("grade_id")
         service = self.get_service()
         serializer.instance = service.create(grade=grade, **serializer.validated_data)
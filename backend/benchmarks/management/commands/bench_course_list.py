@@ -0,0 +1,63 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from benchmarks.utils import create_bench_user, format_summary, get_client, summarize
+from core.views import response_cache
+from courses.membership import member_count
+from courses.models import Course
+from courses.serializers import CourseListSerializer, CourseSerializer
+
+
+def timed(func, iterations: int) -> list[float]:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+class Command(BaseCommand):
+    help = "Compares the course list page of CourseSerializer with the `.values()` based CourseListSerializer."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50)
+
+    def handle(self, *args, **options):
+        iterations, page_size = options["iterations"], settings.REST_FRAMEWORK["PAGE_SIZE"]
+        if not Course.objects.exists():
+            self.stdout.write(self.style.WARNING("No courses, run seed_db first."))
+            return
+        instances = list(Course.objects.prefetch_related("teachers", "students")[:page_size])
+        rows = list(
+            Course.objects.values("id", "title", "author", "created_at", "updated_at").annotate(
+                teacher_count=member_count(Course.teachers), student_count=member_count(Course.students)
+            )[:page_size]
+        )
+        serialization = {
+            "serialize CourseSerializer": summarize(
+                timed(lambda: CourseSerializer(instances, many=True).data, iterations)
+            ),
+            "serialize CourseListSerializer": summarize(
+                timed(lambda: CourseListSerializer(rows, many=True).data, iterations)
+            ),
+        }
+        for name, summary in serialization.items():
+            self.stdout.write(format_summary(name, summary))
+        speedup = (
+            serialization["serialize CourseSerializer"]["p50"] / serialization["serialize CourseListSerializer"]["p50"]
+        )
+        self.stdout.write(f"serialization speedup (p50): {speedup:.1f}x")
+
+        user = create_bench_user("STUDENT")
+        try:
+            client = get_client(user)
+            for query in ("", "?expand=teachers,students"):
+                client.get(f"/api/v1/courses/{query}")
+                samples = timed(lambda query=query: client.get(f"/api/v1/courses/{query}"), iterations)
+                self.stdout.write(format_summary(f"GET /courses/{query}", summarize(samples)))
+            self.stdout.write(f"response cache hits={response_cache.hits} misses={response_cache.misses}")
+        finally:
+            user.delete()
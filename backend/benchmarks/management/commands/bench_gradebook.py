@@ -0,0 +1,69 @@
+import resource
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from benchmarks.utils import get_client
+from courses.gradebook import EXPORT_FORMATS, get_gradebook_rows
+from courses.models import Course
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of the process, `ru_maxrss` is in kilobytes on Linux."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = "Measures rows per second and memory of the gradebook export on the seed_db dataset."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--course", type=int, help="Course id, the course with most submissions by default.")
+        parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+        parser.add_argument(
+            "--materialize", action="store_true", help="Also build the whole export in memory to compare with."
+        )
+
+    def handle(self, *args, **options):
+        queryset = Course.objects.select_related("author")
+        if options["course"]:
+            course = queryset.filter(pk=options["course"]).first()
+        else:
+            course = (
+                queryset.annotate(submission_count=Count("lectures__homeworks__submissions"))
+                .order_by("-submission_count")
+                .first()
+            )
+        if course is None:
+            self.stdout.write(self.style.WARNING("No courses, run seed_db first."))
+            return
+        stream, _ = EXPORT_FORMATS[options["format"]]
+        header_lines = 1 if options["format"] == "csv" else 0
+
+        start = time.perf_counter()
+        response = get_client(course.author).get(f"/api/v1/courses/{course.pk}/gradebook.{options['format']}")
+        size = rows = 0
+        tracemalloc.start()
+        for chunk in response.streaming_content:
+            size += len(chunk)
+            rows += chunk.count(b"\n")
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.report("streaming", rows - header_lines, size, time.perf_counter() - start, traced_peak)
+
+        if options["materialize"]:
+            start = time.perf_counter()
+            tracemalloc.start()
+            body = "".join(stream(list(get_gradebook_rows(course.pk))))
+            _, traced_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.report(
+                "materialized", body.count("\n") - header_lines, len(body), time.perf_counter() - start, traced_peak
+            )
+
+    def report(self, name: str, rows: int, size: int, elapsed: float, traced_peak: int):
+        self.stdout.write(
+            f"{name:<14} rows={rows:<8} size={size / 1024:10.1f}KB rows/s={rows / elapsed:10.0f} "
+            f"traced_peak={traced_peak / 1024 / 1024:8.2f}MB peak_rss={peak_rss_mb():8.1f}MB"
+        )
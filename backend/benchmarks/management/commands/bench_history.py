@@ -0,0 +1,73 @@
+import time
+
+import factory
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+
+from core.history import HISTORY_RECORDING_MODES
+from courses.models import Course, Grade, HomeWork, Lecture, Submission, User
+from mock.factories import CourseFactory, GradeFactory, HomeWorkFactory, LectureFactory, SubmissionFactory, UserFactory
+
+RECORDED_MODELS = (User, Course, Lecture, HomeWork, Submission, Grade)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures write throughput of a seed_db like workload with each HISTORY_RECORDING mode. "
+        "Every run is committed and deleted afterwards with its history."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lectures", type=int, default=20)
+        parser.add_argument("--homeworks", type=int, default=5, help="Homeworks per lecture.")
+        parser.add_argument("--students", type=int, default=10, help="Students submitting every homework.")
+        parser.add_argument("--modes", nargs="+", choices=HISTORY_RECORDING_MODES, default=["off", "inline", "batched"])
+
+    def write(self, options) -> dict[type, list]:
+        """Creates a course like seed_db does, in one transaction, and returns created objects by model."""
+        teacher = UserFactory(username=factory.Faker("uuid4"), role="TEACHER")
+        students = UserFactory.create_batch(options["students"], username=factory.Faker("uuid4"))
+        course = CourseFactory(author=teacher)
+        course.teachers.add(teacher)
+        course.students.add(*students)
+        lectures = LectureFactory.create_batch(options["lectures"], course=course, teacher=teacher)
+        homeworks = HomeWorkFactory.create_batch(
+            options["lectures"] * options["homeworks"], lecture=factory.Iterator(lectures)
+        )
+        submissions = [
+            SubmissionFactory(homework=homework, author=student) for homework in homeworks for student in students
+        ]
+        grades = GradeFactory.create_batch(len(submissions), submission=factory.Iterator(submissions), author=teacher)
+        return {
+            User: [teacher, *students],
+            Course: [course],
+            Lecture: lectures,
+            HomeWork: homeworks,
+            Submission: submissions,
+            Grade: grades,
+        }
+
+    def handle(self, *args, **options):
+        for mode in options["modes"]:
+            with override_settings(HISTORY_RECORDING=mode):
+                start = time.perf_counter()
+                with transaction.atomic():
+                    created = self.write(options)
+                elapsed = time.perf_counter() - start
+            objects = sum(len(instances) for instances in created.values())
+            history = self.cleanup(created)
+            self.stdout.write(
+                f"{mode:<8} objects={objects:<6} history_rows={history:<6} elapsed={elapsed:8.2f}s "
+                f"objects/s={objects / elapsed:8.0f}"
+            )
+
+    def cleanup(self, created: dict[type, list]) -> int:
+        """Deletes created objects without recording history and returns the number of their historical rows."""
+        history = 0
+        with override_settings(HISTORY_RECORDING="off"), transaction.atomic():
+            for model in reversed(RECORDED_MODELS):
+                pks = [instance.pk for instance in created[model]]
+                history += model.history.filter(**{f"{model._meta.pk.attname}__in": pks}).delete()[0]
+                model.objects.filter(pk__in=pks).delete()
+        return history
@@ -0,0 +1,97 @@
+import re
+import statistics
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Exists, ForeignKey, OuterRef
+
+from courses.models import Comment, Course, HomeWork, Lecture, Submission
+
+INDEXED_MODELS = (Lecture, HomeWork, Submission, Comment)
+THROUGH_INDEXES = ("course_students_user_course_idx", "course_teachers_user_course_idx")
+EXECUTION_TIME = re.compile(r"Execution Time: ([\d.]+) ms")
+
+
+def top(queryset, relation: str):
+    """Returns the id of the object with the largest number of related rows."""
+    return queryset.annotate(n=Count(relation)).order_by("-n").values_list("id", flat=True).first()
+
+
+def get_queries() -> dict:
+    """Querysets of the API, with ids of the largest objects of the dataset."""
+    course_id = top(Course.objects, "lectures")
+    lecture_id = top(Lecture.objects, "homeworks")
+    homework_id = top(HomeWork.objects, "submissions")
+    teacher_id = HomeWork.objects.values("author_id").annotate(n=Count("id")).order_by("-n")[0]["author_id"]
+    student_id = Submission.objects.filter(homework_id=homework_id).values_list("author_id", flat=True).first()
+    grade_id = Comment.objects.values("grade_id").annotate(n=Count("id")).order_by("-n")[0]["grade_id"]
+    student_course_ids = list(Course.objects.filter(students__id=student_id).values_list("id", flat=True))
+    return {
+        "course lectures": Lecture.objects.filter(course_id=course_id)[:100],
+        "lecture homeworks": HomeWork.objects.filter(lecture_id=lecture_id)[:100],
+        "teacher homeworks": HomeWork.objects.filter(author_id=teacher_id)[:100],
+        "homework submissions": Submission.objects.filter(homework_id=homework_id).select_related("grade")[:100],
+        "student submissions": Submission.objects.filter(homework_id=homework_id, author_id=student_id)[:100],
+        "grade comments": Comment.objects.filter(grade_id=grade_id)[:100],
+        "student courses": Course.objects.filter(students__id=student_id).values_list("id", flat=True),
+        "student submitted homeworks": HomeWork.objects.filter(
+            Exists(Submission.objects.filter(homework=OuterRef("pk"), author_id=student_id)),
+            lecture__course_id__in=student_course_ids,
+        )[:100],
+    }
+
+
+def drop_new_indexes(cursor):
+    """Restores indexes as they were before composite ones, must be called in a transaction."""
+    for model in INDEXED_MODELS:
+        for index in model._meta.indexes:
+            cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+        for field in model._meta.get_fields():
+            if isinstance(field, ForeignKey) and not field.db_index:
+                table, column = model._meta.db_table, field.column
+                cursor.execute(f'CREATE INDEX "bench_{table}_{column}" ON "{table}" ("{column}")')
+    for name in THROUGH_INDEXES:
+        cursor.execute(f"DROP INDEX {connection.ops.quote_name(name)}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares plans and execution time of the API queries with and without composite indexes. "
+        "Old indexes are restored in a transaction which is rolled back, tables are locked meanwhile, "
+        "so run it on a copy of the data, e.g. filled by seed_db."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--plans", action="store_true", help="Print plans of both runs.")
+
+    def measure(self, queries: dict, repeat: int) -> dict:
+        results = {}
+        for name, queryset in queries.items():
+            timings = []
+            for _ in range(repeat):
+                plan = queryset.explain(analyze=True)
+                timings.append(float(EXECUTION_TIME.search(plan).group(1)))
+            results[name] = (statistics.median(timings), plan)
+        return results
+
+    def handle(self, *args, **options):
+        if not Submission.objects.exists():
+            self.stdout.write(self.style.WARNING("No submissions, run seed_db first."))
+            return
+        queries = get_queries()
+        after = self.measure(queries, options["repeat"])
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                drop_new_indexes(cursor)
+            before = self.measure(queries, options["repeat"])
+            transaction.set_rollback(True)
+
+        for name in queries:
+            (before_ms, before_plan), (after_ms, after_plan) = before[name], after[name]
+            self.stdout.write(
+                f"{name:<28} before={before_ms:8.3f}ms after={after_ms:8.3f}ms "
+                f"speedup={before_ms / max(after_ms, 0.001):6.2f}x"
+            )
+            if options["plans"]:
+                self.stdout.write(f"-- before\n{before_plan}\n-- after\n{after_plan}\n")
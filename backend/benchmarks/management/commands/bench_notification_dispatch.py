@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from benchmarks.utils import create_bench_user, format_summary, get_client, summarize
+
+URL = "/api/v1/courses/"
+
+
+class Command(BaseCommand):
+    help = "Compares latency of POST /api/v1/courses/ with inline and deferred notification dispatch."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Requests per dispatch mode.")
+
+    def handle(self, *args, **options):
+        teacher = create_bench_user("TEACHER")
+        client = get_client(teacher)
+        try:
+            for mode in ("inline", "thread"):
+                with override_settings(NOTIFICATION_DISPATCH=mode):
+                    samples = []
+                    for number in range(options["requests"]):
+                        start = time.perf_counter()
+                        response = client.post(URL, {"title": f"Benchmark {number}"}, format="json")
+                        samples.append((time.perf_counter() - start) * 1000)
+                        if response.status_code != 201:
+                            raise RuntimeError(f"Unexpected response {response.status_code}: {response.content}")
+                    # Let the dispatcher flush before the next run.
+                    time.sleep(settings.NOTIFICATION_COALESCE_WINDOW * 2)
+                self.stdout.write(format_summary(f"POST {URL} dispatch={mode}", summarize(samples)))
+        finally:
+            teacher.delete()
@@ -0,0 +1,54 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from api.v1.notifications import NotificationSenderV1
+from courses.models import Course, Submission
+from project.constants import EventEnum
+from project.notifications import Notification, orjson
+
+QUERYSETS = {
+    Course: Course.objects.prefetch_related("teachers", "students"),
+    Submission: Submission.objects.select_related("grade"),
+}
+
+
+def legacy_encode(sender: NotificationSenderV1) -> str:
+    """The render -> parse -> dump path which `NotificationSender.encode` replaced."""
+    serializer_class = sender.serializers_map[type(sender.instance)]
+    json_string = JSONRenderer().render(serializer_class(sender.instance).data).decode("utf-8")
+    obj = json.loads(json_string)
+    notification = Notification(
+        event=sender.event, object_name=serializer_class(sender.instance).Meta.api_object_name, obj=obj
+    )
+    return json.dumps(notification.to_dict())
+
+
+def encode(sender: NotificationSenderV1) -> str:
+    return sender.encode()
+
+
+class Command(BaseCommand):
+    help = "Measures notification encode throughput for every model in NotificationSenderV1.serializers_map."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        self.stdout.write(f"JSON backend: {'orjson' if orjson else 'json'}")
+        for model in NotificationSenderV1.serializers_map:
+            instance = QUERYSETS.get(model, model.objects).first()
+            if instance is None:
+                self.stdout.write(self.style.WARNING(f"No {model.__name__} objects, run seed_db first."))
+                continue
+            results = []
+            for encoder in (legacy_encode, encode):
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    encoder(NotificationSenderV1(instance=instance, event=EventEnum.UPDATE))
+                elapsed = time.perf_counter() - start
+                results.append(f"{encoder.__name__}={iterations / elapsed:10.0f}/s")
+            self.stdout.write(f"{model.__name__:<12} " + " ".join(results))
@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.urls import websocket_urlpatterns
+from benchmarks.utils import create_bench_user, format_summary, summarize
+from core.auth_middleware import JWTAuthMiddlewareStack, user_cache
+
+PATH = "/api/v1/notifications/"
+IN_MEMORY_CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+MODES = {
+    "no-cache": {"WEBSOCKET_USER_CACHE_TTL": 0},
+    "cache": {},
+    "claims": {"WEBSOCKET_AUTH_FROM_CLAIMS": True},
+}
+
+
+class Command(BaseCommand):
+    help = "Opens many concurrent websocket connections to measure JWT authentication on connect."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connections", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=200)
+        parser.add_argument("--users", type=int, default=50, help="Distinct users the connections are spread over.")
+
+    def handle(self, *args, **options):
+        users = [create_bench_user("STUDENT") for _ in range(options["users"])]
+        tokens = [str(AccessToken.for_user(user)) for user in users]
+        application = JWTAuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+        try:
+            for mode, overrides in MODES.items():
+                with override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS, **overrides):
+                    user_cache.clear()
+                    samples = asyncio.run(self.connect_all(application, tokens, options))
+                self.stdout.write(
+                    format_summary(f"connect auth={mode}", summarize(samples))
+                    + f" cache hits={user_cache.hits} misses={user_cache.misses}"
+                )
+        finally:
+            for user in users:
+                user.delete()
+
+    async def connect_all(self, application, tokens, options) -> list[float]:
+        semaphore = asyncio.Semaphore(options["concurrency"])
+
+        async def connect(number):
+            token = tokens[number % len(tokens)]
+            async with semaphore:
+                communicator = WebsocketCommunicator(
+                    application, PATH, headers=[(b"authorization", f"Bearer {token}".encode())]
+                )
+                start = time.perf_counter()
+                connected, _ = await communicator.connect(timeout=30)
+                elapsed = (time.perf_counter() - start) * 1000
+                await communicator.disconnect(timeout=30)
+            if not connected:
+                raise RuntimeError("Connection was rejected")
+            return elapsed
+
+        return await asyncio.gather(*(connect(number) for number in range(options["connections"])))
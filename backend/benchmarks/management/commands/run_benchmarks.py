@@ -0,0 +1,152 @@
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from faker import Faker
+
+from benchmarks.utils import format_summary, get_client, summarize
+from core.views import response_cache
+from courses.models import HomeWork
+
+
+def get_endpoints() -> dict[str, tuple]:
+    """
+    Maps names to (user, method, url, payload) of v1 endpoints.
+
+    Objects are the largest ones of the dataset: the homework with most submissions,
+    its lecture and course, a teacher and a student of the course. Grades are read
+    and changed by the author of the first graded submission of the homework.
+    """
+    homework = (
+        HomeWork.objects.select_related("lecture__course", "lecture__teacher")
+        .annotate(n=Count("submissions"))
+        .order_by("-n", "id")
+        .first()
+    )
+    if homework is None:
+        raise CommandError("No homeworks, run seed_db first.")
+    graded = homework.submissions.filter(grade__isnull=False).select_related("grade__author").order_by("id").first()
+    if graded is None:
+        raise CommandError(f"No graded submissions of the homework {homework.id}, run seed_db first.")
+    lecture, course = homework.lecture, homework.lecture.course
+    teacher, student, grader = lecture.teacher, course.students.order_by("id").first(), graded.grade.author
+    submissions = list(homework.submissions.order_by("id").values_list("id", flat=True)[:20])
+    return {
+        "course list": (student, "get", "/api/v1/courses/", None),
+        "course list expanded": (student, "get", "/api/v1/courses/?expand=teachers,students", None),
+        "course detail": (student, "get", f"/api/v1/courses/{course.id}/", None),
+        "course stats": (teacher, "get", f"/api/v1/courses/{course.id}/stats/", None),
+        "course lectures": (student, "get", f"/api/v1/courses/{course.id}/lectures/", None),
+        "lecture homeworks": (teacher, "get", f"/api/v1/lectures/{lecture.id}/homeworks/", None),
+        "homework submissions": (teacher, "get", f"/api/v1/homeworks/{homework.id}/submissions/", None),
+        "my homeworks": (student, "get", "/api/v1/my/homeworks/", None),
+        "my homeworks submitted": (student, "get", "/api/v1/my/homeworks/?issubmitted=true", None),
+        "my homeworks not graded": (student, "get", "/api/v1/my/homeworks/?isgraded=false", None),
+        "grade comments": (grader, "get", f"/api/v1/submissions/grade/{graded.grade.pk}/comments/", None),
+        "grade update": (grader, "patch", f"/api/v1/submissions/{graded.id}/grade/", {"score": 50}),
+        "bulk grading": (
+            teacher,
+            "post",
+            f"/api/v1/homeworks/{homework.id}/grades/",
+            [{"submission_id": submission, "score": 50} for submission in submissions],
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a fixed dataset by seed_db (which deletes existing data) and measures latency, queries and "
+        "allocations of v1 endpoints. Results can be saved as a JSON baseline and compared with one, "
+        "the command fails if an endpoint makes more queries or its p95 grows by more than --threshold."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", type=float, default=1, help="Scale of the seed_db dataset.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed of the dataset.")
+        parser.add_argument("--no-seed", action="store_true", help="Benchmark the existing data.")
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--cold", action="store_true", help="Clear caches before every request.")
+        parser.add_argument("--endpoints", nargs="+", help="Names of endpoints, all of them by default.")
+        parser.add_argument("--output", type=Path, help="Save results to a JSON file.")
+        parser.add_argument("--baseline", type=Path, help="Compare results with a JSON file.")
+        parser.add_argument("--threshold", type=float, default=20, help="Allowed p95 growth, in percent.")
+
+    def handle(self, *args, **options):
+        if not options["no_seed"]:
+            random.seed(options["seed"])
+            Faker.seed(options["seed"])
+            call_command("seed_db", scale=options["scale"], copy=True, stdout=self.stdout)
+        endpoints = get_endpoints()
+        if options["endpoints"]:
+            endpoints = {name: endpoints[name] for name in options["endpoints"]}
+
+        results = {}
+        for name, endpoint in endpoints.items():
+            results[name] = self.measure(name, *endpoint, options["iterations"], options["cold"])
+            self.stdout.write(
+                f"{format_summary(name, results[name])} queries={results[name]['queries']:<4} "
+                f"allocated={results[name]['allocated_kb']:8.1f}KB"
+            )
+
+        report = {"options": {key: options[key] for key in ("scale", "seed", "iterations", "cold")}, "results": results}
+        if options["output"]:
+            options["output"].write_text(json.dumps(report, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Results are saved to {options['output']}."))
+        if options["baseline"]:
+            self.compare(results, json.loads(options["baseline"].read_text())["results"], options["threshold"])
+
+    def measure(self, name: str, user, method: str, url: str, payload, iterations: int, cold: bool) -> dict:
+        client = get_client(user)
+        request = getattr(client, method)
+        samples, queries = [], []
+        for _ in range(iterations + 1):
+            if cold:
+                cache.clear()
+                response_cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = request(url, payload, format="json")
+                elapsed = (time.perf_counter() - start) * 1000
+            if response.status_code >= 400:
+                raise CommandError(f"{name}: {method.upper()} {url} returned {response.status_code}.")
+            samples.append(elapsed)
+            queries.append(len(captured))
+        # The first request warms up caches of the client, it isn't counted.
+        summary = summarize(samples[1:])
+        summary["queries"] = statistics.median_high(queries[1:])
+
+        # Tracing slows requests down, so allocations are measured by a separate request.
+        tracemalloc.start()
+        request(url, payload, format="json")
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        summary["allocated_kb"] = peak / 1024
+        return summary
+
+    def compare(self, results: dict, baseline: dict, threshold: float):
+        regressions = []
+        for name, result in results.items():
+            base = baseline.get(name)
+            if base is None:
+                self.stdout.write(f"{name:<40} new endpoint")
+                continue
+            p95_change = (result["p95"] / base["p95"] - 1) * 100
+            queries_change = result["queries"] - base["queries"]
+            line = f"{name:<40} p95 {p95_change:+7.1f}% queries {queries_change:+d}"
+            if p95_change > threshold or queries_change > 0:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        if regressions:
+            raise CommandError(f"Regressed endpoints: {', '.join(regressions)}.")
+        self.stdout.write(self.style.SUCCESS("No regressions."))
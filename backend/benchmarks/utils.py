@@ -0,0 +1,40 @@
+import statistics
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+def summarize(samples: list[float]) -> dict:
+    """Returns mean and p50/p95/p99 of latency samples in milliseconds."""
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "n": len(samples),
+        "mean": statistics.fmean(samples),
+        "p50": cuts[49],
+        "p95": cuts[94],
+        "p99": cuts[98],
+    }
+
+
+def format_summary(name: str, summary: dict) -> str:
+    return (
+        f"{name:<40} n={summary['n']:<6} mean={summary['mean']:8.2f}ms "
+        f"p50={summary['p50']:8.2f}ms p95={summary['p95']:8.2f}ms p99={summary['p99']:8.2f}ms"
+    )
+
+
+def create_bench_user(role: str) -> User:
+    """Creates a throwaway user, the caller is responsible for deleting it."""
+    return User.objects.create(username=f"bench_{uuid.uuid4().hex[:12]}", role=role)
+
+
+def get_client(user: User) -> APIClient:
+    """Returns an authenticated client which passes `ALLOWED_HOSTS` outside of the test runner."""
+    host = next((host.lstrip(".") for host in settings.ALLOWED_HOSTS if host != "*"), "localhost")
+    client = APIClient(HTTP_HOST=host)
+    client.force_authenticate(user)
+    return client
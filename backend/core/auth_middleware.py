@@ -1,23 +1,56 @@
-import jwt
+import asyncio
+import time
+
 from channels.auth import AuthMiddlewareStack
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import AccessToken
 
+from core.cache import TTLCache
+
+# Invalidated on user save in this process, other processes rely on the TTL.
+user_cache = TTLCache(maxsize=settings.WEBSOCKET_USER_CACHE_SIZE)
+# Snapshots being loaded, so concurrent connects of one user share a query.
+pending_snapshots: dict[int, asyncio.Future] = {}
+
 
 @database_sync_to_async
-def get_user_from_token(token_key):
+def get_user_snapshot(user_id):
     User = get_user_model()  # NOQA: N806
+    return User.objects.only("id", "username", "role", "is_active").filter(id=user_id, is_active=True).first()
+
+
+async def load_user_snapshot(user_id):
+    future = pending_snapshots.get(user_id)
+    if future is None:
+        future = asyncio.ensure_future(get_user_snapshot(user_id))
+        pending_snapshots[user_id] = future
+        future.add_done_callback(lambda _: pending_snapshots.pop(user_id, None))
+    return await asyncio.shield(future)
+
+
+async def get_user_from_token(token_key):
     try:
         access_token = AccessToken(token_key)
-        user_id = access_token["user_id"]
-
-        return User.objects.get(id=user_id)
-    except (jwt.exceptions.InvalidSignatureError, jwt.exceptions.ExpiredSignatureError, User.DoesNotExist):
-        return AnonymousUser()
-    except Exception:
+        user_id = int(access_token[api_settings.USER_ID_CLAIM])
+    except (TokenError, KeyError, ValueError):
         return AnonymousUser()
+    if settings.WEBSOCKET_AUTH_FROM_CLAIMS:
+        return TokenUser(access_token)
+
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await load_user_snapshot(user_id)
+        if user is None:
+            return AnonymousUser()
+        ttl = min(settings.WEBSOCKET_USER_CACHE_TTL, access_token["exp"] - time.time())
+        user_cache.set(user_id, user, ttl)
+    return user
 
 
 class JWTAuthMiddleware:
@@ -0,0 +1,215 @@
+import threading
+from datetime import UTC, timedelta
+from functools import partial
+from itertools import groupby
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Exists, Max, Min, Model, OuterRef, Q, QuerySet
+from django.utils import timezone
+from simple_history.models import HistoricalChanges, HistoricalRecords
+from simple_history.signals import pre_create_historical_record
+
+HISTORY_RECORDING_MODES = ("off", "inline", "batched", "celery")
+HISTORY_BATCH_SIZE = 1000
+
+
+def serialize_history(rows: list[Model]) -> list[dict]:
+    """Column values of historical rows without their primary keys, to insert them elsewhere."""
+    fields = [field for field in rows[0]._meta.concrete_fields if not field.primary_key]
+    return [{field.attname: getattr(row, field.attname) for field in fields} for row in rows]
+
+
+def write_history(rows: list[Model], using: str):
+    """Inserts historical rows with a query per model and batch, or hands them over to Celery."""
+    for model, model_rows in groupby(rows, key=type):
+        model_rows = list(model_rows)
+        if settings.HISTORY_RECORDING == "celery":
+            from core.tasks import write_history_rows
+
+            write_history_rows.delay(model._meta.label, serialize_history(model_rows), using)
+        else:
+            model._default_manager.using(using).bulk_create(model_rows, batch_size=HISTORY_BATCH_SIZE)
+
+
+class HistoryBuffer(threading.local):
+    """
+    Historical rows waiting for the commit of the transaction which created them.
+
+    Rows are kept per savepoint, next to an `on_commit` callback which writes them
+    and its position in `run_on_commit`. Django drops callbacks of rolled back
+    savepoints and transactions, so rows whose callback is not at its position
+    anymore are dropped as well. Callbacks before it are never removed while its
+    savepoint is active, so the check doesn't scan the list. A new callback drops
+    entries of savepoints which are not active anymore, released ones are written
+    by their callbacks and rolled back ones never are.
+    """
+
+    def __init__(self):
+        self.pending: dict[tuple[str, tuple], tuple[partial, list[Model], int]] = {}
+
+    def add(self, row: Model, using: str):
+        connection = connections[using]
+        if not connection.in_atomic_block:
+            write_history([row], using)
+            return
+        key = (using, tuple(connection.savepoint_ids))
+        callback, rows, index = self.pending.get(key, (None, None, None))
+        run_on_commit = connection.run_on_commit
+        if callback is None or index >= len(run_on_commit) or run_on_commit[index][1] is not callback:
+            self.drop_inactive(key)
+            rows = []
+            callback = partial(self.flush, key, rows)
+            self.pending[key] = (callback, rows, len(run_on_commit))
+            transaction.on_commit(callback, using=using)
+        rows.append(row)
+
+    def drop_inactive(self, key: tuple[str, tuple]):
+        """Drops entries of the connection except ones of the savepoints `key` is nested in."""
+        using, savepoint_ids = key
+        for pending_using, pending_ids in list(self.pending):
+            if pending_using == using and pending_ids != savepoint_ids[: len(pending_ids)]:
+                del self.pending[pending_using, pending_ids]
+
+    def flush(self, key: tuple[str, tuple], rows: list[Model]):
+        if self.pending.get(key, (None, None, None))[1] is rows:
+            del self.pending[key]
+        # Grouping keeps the insert order of every model.
+        write_history(sorted(rows, key=lambda row: row._meta.label), key[0])
+
+
+history_buffer = HistoryBuffer()
+
+
+class BufferedHistoricalRecords(HistoricalRecords):
+    """
+    HistoricalRecords which write rows according to the `HISTORY_RECORDING` setting.
+
+    "inline" saves a row per change as simple_history does, "batched" inserts rows of
+    a transaction by a `bulk_create` per model on commit, "celery" sends them to the
+    `write_history_rows` task on commit and "off" doesn't record history. Buffered
+    rows don't send `post_create_historical_record`, models with many to many history
+    fields are always recorded inline.
+    """
+
+    def create_historical_record(self, instance, history_type, using=None):
+        mode = settings.HISTORY_RECORDING
+        if mode == "off":
+            return
+        if mode == "inline" or self.m2m_fields:
+            super().create_historical_record(instance, history_type, using)
+            return
+        history_instance = self.build_historical_record(instance, history_type, using)
+        history_buffer.add(history_instance, using or router.db_for_write(type(history_instance)))
+
+    def build_historical_record(self, instance, history_type, using=None) -> Model:
+        """Same as `create_historical_record` of simple_history, without saving the row."""
+        using = using if self.use_base_model_db else None
+        history_date = getattr(instance, "_history_date", timezone.now())
+        history_user = self.get_history_user(instance)
+        history_change_reason = self.get_change_reason_for_object(instance, history_type, using)
+        manager = getattr(instance, self.manager_name)
+
+        attrs = {field.attname: getattr(instance, field.attname) for field in self.fields_included(instance)}
+        if getattr(manager.model, "history_relation", None) is not None:
+            attrs["history_relation"] = instance
+
+        history_instance = manager.model(
+            history_date=history_date,
+            history_type=history_type,
+            history_user=history_user,
+            history_change_reason=history_change_reason,
+            **attrs,
+        )
+        pre_create_historical_record.send(
+            sender=manager.model,
+            instance=instance,
+            history_date=history_date,
+            history_user=history_user,
+            history_change_reason=history_change_reason,
+            history_instance=history_instance,
+            using=using,
+        )
+        return history_instance
+
+
+def get_history_models() -> list[type[Model]]:
+    return [model for model in apps.get_models() if issubclass(model, HistoricalChanges)]
+
+
+def get_expired_history(model: type[Model], keep_versions: int, keep_days: int) -> QuerySet:
+    """Historical rows older than `keep_days` which have at least `keep_versions` newer versions of their object."""
+    expired = model._default_manager.filter(history_date__lt=timezone.now() - timedelta(days=keep_days))
+    if keep_versions:
+        object_id = model.instance_type._meta.pk.attname
+        newer = model._default_manager.filter(
+            Q(history_date__gt=OuterRef("history_date"))
+            | Q(history_date=OuterRef("history_date"), pk__gt=OuterRef("pk")),
+            **{object_id: OuterRef(object_id)},
+        )
+        # Any `keep_versions` newer rows will do, so the offset needs no ordering.
+        expired = expired.filter(Exists(newer[keep_versions - 1 : keep_versions]))
+    return expired
+
+
+def archive_history(model: type[Model], queryset: QuerySet) -> int:
+    """
+    Moves rows of the queryset to `<table>_archive`, partitioned by month of `history_date`.
+
+    The archive table and its partitions are created on demand, rows are deleted and
+    inserted by a single statement. Columns added to the model are added to the archive
+    as nullable ones, columns which the model dropped become nullable there.
+    """
+    connection = connections[queryset.db]
+    quote = connection.ops.quote_name
+    table = model._meta.db_table
+    archive = f"{table}_archive"
+    months = queryset.datetimes("history_date", "month", tzinfo=UTC)
+    fields = {field.column: field for field in model._meta.concrete_fields}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {quote(archive)} (LIKE {quote(table)}) PARTITION BY RANGE (history_date)"
+        )
+        archived = {column.name: column for column in connection.introspection.get_table_description(cursor, archive)}
+        for name, field in fields.items():
+            if name not in archived:
+                cursor.execute(f"ALTER TABLE {quote(archive)} ADD COLUMN {quote(name)} {field.db_type(connection)}")
+        for name, column in archived.items():
+            if name not in fields and not column.null_ok:
+                cursor.execute(f"ALTER TABLE {quote(archive)} ALTER COLUMN {quote(name)} DROP NOT NULL")
+        for month in months:
+            next_month = (month + timedelta(days=32)).replace(day=1)
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {quote(f'{archive}_{month:%Y_%m}')} PARTITION OF {quote(archive)} "
+                "FOR VALUES FROM (%s) TO (%s)",
+                [month, next_month],
+            )
+        sql, params = queryset.values("pk").query.sql_with_params()
+        pk = quote(model._meta.pk.column)
+        columns = ", ".join(quote(name) for name in fields)
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {quote(table)} WHERE {pk} IN ({sql}) RETURNING {columns}) "  # NOQA: S608
+            f"INSERT INTO {quote(archive)} ({columns}) SELECT {columns} FROM moved",
+            params,
+        )
+        return cursor.rowcount
+
+
+def compact_history(
+    model: type[Model], keep_versions: int, keep_days: int, batch_size: int, archive: bool = False
+) -> int:
+    """
+    Deletes or archives expired history of the model and returns the number of rows.
+
+    Rows are handled in ranges of `batch_size` ids, each one in its own transaction,
+    so tables are locked shortly.
+    """
+    expired = get_expired_history(model, keep_versions, keep_days)
+    bounds = model._default_manager.aggregate(min_id=Min("pk"), max_id=Max("pk"))
+    total = 0
+    for start in range(bounds["min_id"] or 0, (bounds["max_id"] or 0) + 1, batch_size):
+        batch = expired.filter(pk__gte=start, pk__lt=start + batch_size)
+        with transaction.atomic(using=batch.db):
+            total += archive_history(model, batch) if archive else batch.delete()[0]
+    return total
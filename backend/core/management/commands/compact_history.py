@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.history import compact_history, get_expired_history, get_history_models
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes historical rows older than --keep-days beyond the last --keep-versions of every object, "
+        "or moves them to monthly partitions of archive tables. Rows are handled in batches of ids, "
+        "each one in its own transaction, so tables are locked shortly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep-versions", type=int, default=settings.HISTORY_KEEP_VERSIONS)
+        parser.add_argument("--keep-days", type=int, default=settings.HISTORY_KEEP_DAYS)
+        parser.add_argument("--batch-size", type=int, default=settings.HISTORY_COMPACT_BATCH_SIZE)
+        parser.add_argument("--archive", action="store_true", default=settings.HISTORY_ARCHIVE)
+        parser.add_argument("--models", nargs="+", help="Labels of historical models, all of them by default.")
+        parser.add_argument("--dry-run", action="store_true", help="Only count expired rows.")
+
+    def handle(self, *args, **options):
+        models = get_history_models()
+        if options["models"]:
+            models = [model for model in models if model._meta.label in options["models"]]
+        action = "expired" if options["dry_run"] else "archived" if options["archive"] else "deleted"
+        for model in models:
+            if options["dry_run"]:
+                total = get_expired_history(model, options["keep_versions"], options["keep_days"]).count()
+            else:
+                total = compact_history(
+                    model,
+                    options["keep_versions"],
+                    options["keep_days"],
+                    options["batch_size"],
+                    archive=options["archive"],
+                )
+            self.stdout.write(self.style.SUCCESS(f"{model._meta.label}: {total} rows {action}."))
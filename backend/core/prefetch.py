@@ -0,0 +1,96 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Model, Prefetch, QuerySet
+from rest_framework.relations import ManyRelatedField, RelatedField
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+def _get_model_field(model: type[Model], field):
+    if len(field.source_attrs) != 1:
+        return None
+    try:
+        return model._meta.get_field(field.source_attrs[0])
+    except FieldDoesNotExist:
+        return None
+
+
+def plan_prefetch(
+    serializer: BaseSerializer, querysets: dict[str, QuerySet], path: str = ""
+) -> tuple[list, list, list | None]:
+    """
+    Returns `select_related`, `prefetch_related` and `only` lookups needed to serialize the model of `serializer`.
+
+    Nested serializers and related fields which need more than a primary key are
+    selected, nested lists and many related fields are prefetched. Columns are None
+    if a field reads something else than a model field. `querysets` maps a lookup
+    from the root model to the queryset to prefetch it with.
+    """
+    model = serializer.Meta.model
+    select, prefetch, columns = [], [], [model._meta.pk.name]
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        model_field = _get_model_field(model, field)
+        if model_field is None:
+            columns = None
+            continue
+        lookup = model_field.name
+        full_path = f"{path}__{lookup}" if path else lookup
+        if isinstance(field, ListSerializer):
+            child_select, child_prefetch, child_columns = plan_prefetch(field.child, querysets, full_path)
+            queryset = querysets.get(full_path, field.child.Meta.model._default_manager.all())
+            if child_select:
+                queryset = queryset.select_related(*child_select)
+            queryset = queryset.prefetch_related(*child_prefetch)
+            if child_columns is not None and model_field.one_to_many:
+                # The foreign key is needed to match prefetched objects with their parents.
+                queryset = queryset.only(*child_columns, model_field.field.name)
+            prefetch.append(Prefetch(lookup, queryset=queryset))
+        elif isinstance(field, BaseSerializer):
+            child_select, child_prefetch, child_columns = plan_prefetch(field, querysets, full_path)
+            select += [lookup, *(f"{lookup}__{child}" for child in child_select)]
+            prefetch += [_prefixed(lookup, child) for child in child_prefetch]
+            if columns is not None and child_columns is not None:
+                columns += [f"{lookup}__{child}" for child in child_columns]
+            else:
+                columns = None
+        elif isinstance(field, ManyRelatedField):
+            prefetch.append(lookup)
+        elif isinstance(field, RelatedField) and not field.use_pk_only_optimization():
+            select.append(lookup)
+            columns = None
+        elif not model_field.concrete:
+            columns = None
+        elif columns is not None:
+            columns.append(lookup)
+    return select, prefetch, columns
+
+
+def _prefixed(prefix: str, lookup: str | Prefetch) -> str | Prefetch:
+    if isinstance(lookup, Prefetch):
+        lookup.add_prefix(prefix)
+        return lookup
+    return f"{prefix}__{lookup}"
+
+
+def prefetch_for_serializer(
+    queryset: QuerySet,
+    serializer: BaseSerializer,
+    querysets: dict[str, QuerySet] | None = None,
+    only: bool = False,
+    required: tuple[str, ...] = (),
+) -> QuerySet:
+    """
+    Adds lookups from `plan_prefetch` to the queryset, so nested serializers don't query per object.
+
+    Set `only` to load just the columns which the serializer renders, objects which
+    are saved afterwards need all of them. `required` columns are loaded in any case.
+    """
+    select, prefetch, columns = plan_prefetch(serializer, querysets or {})
+    if select:
+        # Without arguments `select_related` would follow every foreign key.
+        queryset = queryset.select_related(*select)
+    queryset = queryset.prefetch_related(*prefetch)
+    if only and columns is not None:
+        # Querysets of related managers set the parent object by its foreign key.
+        queryset = queryset.only(*columns, *required, *(field.name for field in queryset._known_related_objects))
+    return queryset
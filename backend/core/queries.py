@@ -0,0 +1,37 @@
+import re
+from collections import Counter
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+PLACEHOLDER_LISTS = re.compile(r"\((?:%s, )+%s\)")
+
+
+class QueryBudgetError(AssertionError):
+    """A request made more queries than the `query_budget` of its view."""
+
+
+def fingerprint(sql: str) -> str:
+    """SQL without literals and lengths of IN lists, queries of an N+1 share their fingerprint."""
+    sql = PLACEHOLDER_LISTS.sub("(%s, ...)", LITERALS.sub("?", sql))
+    return " ".join(sql.split())
+
+
+class QueryCounter:
+    """An execute wrapper which records SQL of executed queries."""
+
+    def __init__(self):
+        self.queries: list[str] = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def __len__(self) -> int:
+        return len(self.queries)
+
+    def reset(self):
+        self.queries = []
+
+    def report(self) -> str:
+        """Fingerprints of the queries with their number, most repeated first."""
+        fingerprints = Counter(fingerprint(sql) for sql in self.queries)
+        return "\n".join(f"{count:>4} x {sql}" for sql, count in fingerprints.most_common())
@@ -2,6 +2,7 @@ from abc import ABC
 
 from django.contrib.auth import get_user_model
 from django.db.models import Model
+from simple_history.utils import bulk_create_with_history
 
 User = get_user_model()
 
@@ -18,6 +19,11 @@ class AuthorService(ABC):
     def create(self, **kwargs) -> Model:
         return self.model.objects.create(author=self.author, **kwargs)
 
+    def bulk_create(self, items: list[dict], **kwargs) -> list[Model]:
+        """Creates objects and their history rows with one INSERT each, `kwargs` are shared by all objects."""
+        objs = [self.model(author=self.author, **kwargs, **item) for item in items]
+        return bulk_create_with_history(objs, self.model, default_user=self.author)
+
     def update(self, instance: Model, **kwargs) -> Model:
         for attr, value in kwargs.items():
             setattr(instance, attr, value)
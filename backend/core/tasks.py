@@ -0,0 +1,33 @@
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.conf import settings
+
+from core.history import HISTORY_BATCH_SIZE, compact_history, get_history_models
+from project.celery import app
+from project.notifications import group_send_many
+
+
+@app.task
+def send_notifications(messages):
+    """Sends a batch of coalesced notifications to the channel layer."""
+    async_to_sync(group_send_many)([tuple(message) for message in messages])
+
+
+@app.task
+def write_history_rows(label: str, rows: list[dict], using: str):
+    """Inserts historical rows buffered by `BufferedHistoricalRecords` in the celery mode."""
+    model = apps.get_model(label)
+    model._default_manager.using(using).bulk_create([model(**row) for row in rows], batch_size=HISTORY_BATCH_SIZE)
+
+
+@app.task
+def compact_all_history():
+    """Deletes or archives expired history of all models according to the retention settings."""
+    for model in get_history_models():
+        compact_history(
+            model,
+            settings.HISTORY_KEEP_VERSIONS,
+            settings.HISTORY_KEEP_DAYS,
+            settings.HISTORY_COMPACT_BATCH_SIZE,
+            archive=settings.HISTORY_ARCHIVE,
+        )
@@ -1,3 +1,31 @@
+import hashlib
+import logging
+import random
+from collections.abc import Iterator
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Max, QuerySet, Sum, prefetch_related_objects
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import permissions, status
+from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
+from rest_framework.response import Response
+
+from .cache import TTLCache, get_versions
+from .prefetch import prefetch_for_serializer
+from .queries import QueryBudgetError, QueryCounter
+
+logger = logging.getLogger(__name__)
+
+# Rendered responses by URL, visibility and versions of the data, `hits` and `misses` are its metrics.
+response_cache = TTLCache(maxsize=settings.RESPONSE_CACHE_SIZE)
+
+
 class ServiceViewMixin:
     """Overrides creation, update and delete methods not to use serializer."""
 
@@ -18,3 +46,278 @@ class ServiceViewMixin:
     def perform_destroy(self, instance):
         service = self.get_service()
         service.delete(instance)
+
+
+class ParentObjectMixin:
+    """
+    Resolves parent objects from URL kwargs once per request.
+
+    Set `parent_lookups` to map an URL kwarg to a queryset limited to the columns
+    which are needed from the parent. Permissions and viewset methods share
+    the resolved object through `get_parent`.
+    """
+
+    parent_lookups: dict[str, QuerySet]
+
+    def get_parent(self, kwarg: str):
+        parents = self.__dict__.setdefault("_parents", {})
+        if kwarg not in parents:
+            queryset = self.parent_lookups[kwarg].all()
+            parents[kwarg] = get_object_or_404(queryset, pk=self.kwargs.get(kwarg))
+        return parents[kwarg]
+
+
+class SerializerPrefetchMixin:
+    """
+    Loads relations which the serializer renders together with the objects.
+
+    Safe requests select only columns of rendered fields, so `?fields=` trims
+    the query too. Override `get_prefetch_querysets` to filter nested lists and
+    `get_required_columns` to load columns which the view reads itself.
+    """
+
+    def get_prefetch_querysets(self) -> dict[str, QuerySet]:
+        return {}
+
+    def get_required_columns(self) -> tuple[str, ...]:
+        return ()
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return prefetch_for_serializer(
+            queryset,
+            self.get_serializer(),
+            self.get_prefetch_querysets(),
+            only=self.request.method in permissions.SAFE_METHODS,
+            required=self.get_required_columns(),
+        )
+
+
+class ConditionalGetMixin:
+    """
+    Answers GET requests with `304 Not Modified` if their ETag or Last-Modified didn't change.
+
+    Validators come from the largest `updated_at` and the number of objects of the
+    filtered queryset, computed by one aggregate query before anything is serialized.
+    `retrieve` reads them from the object and prefetches its relations only for a 200.
+    Add lookups of nested relations to `conditional_relations`, so their changes
+    change validators too. Fields updated without `updated_at`, like counters, go to
+    `conditional_fields`, their sums change the ETag and Last-Modified is not sent.
+    Lists get no Last-Modified either, deleting an object doesn't change it.
+    """
+
+    conditional_relations: tuple[str, ...] = ()
+    conditional_fields: tuple[str, ...] = ()
+
+    def get_required_columns(self) -> tuple[str, ...]:
+        """Validators of `retrieve` are read from the object, so `?fields=` must not defer them."""
+        return ("updated_at", *self.conditional_fields)
+
+    def get_etag(self, values: dict) -> str:
+        """Quoted hash of `values`, responses vary by user, query parameters and renderer too."""
+        key = (self.request.user.pk, self.request.get_full_path(), self.request.accepted_renderer.format, values)
+        return f'"{hashlib.md5(repr(key).encode(), usedforsecurity=False).hexdigest()}"'
+
+    def get_validators(self, queryset: QuerySet) -> tuple[str, datetime | None]:
+        aggregates = {"count": Count("pk", distinct=bool(self.conditional_relations)), "updated_at": Max("updated_at")}
+        for lookup in self.conditional_relations:
+            aggregates[f"{lookup}_count"] = Count(lookup, distinct=True)
+            aggregates[f"{lookup}_updated_at"] = Max(f"{lookup}__updated_at")
+        for name in self.conditional_fields:
+            aggregates[f"{name}_sum"] = Sum(name)
+        values = queryset.order_by().aggregate(**aggregates)
+        if self.conditional_fields:
+            return self.get_etag(values), None
+        timestamps = [values[name] for name in aggregates if name.endswith("updated_at") and values[name]]
+        return self.get_etag(values), max(timestamps, default=None)
+
+    def get_conditional_response(self, etag: str, last_modified: datetime | None, response=None):
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        return get_conditional_response(self.request, etag=etag, last_modified=timestamp, response=response)
+
+    def finalize_conditional_response(self, response, etag: str, last_modified: datetime | None):
+        response["ETag"] = etag
+        if last_modified:
+            response["Last-Modified"] = http_date(last_modified.timestamp())
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        etag, _ = self.get_validators(self.filter_queryset(self.get_queryset()))
+        response = self.get_conditional_response(etag, None) or super().list(request, *args, **kwargs)
+        return self.finalize_conditional_response(response, etag, None)
+
+    def retrieve(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        # Relations are prefetched only if the response has a body.
+        instance = get_object_or_404(
+            queryset.prefetch_related(None), **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        self.check_object_permissions(request, instance)
+        if self.conditional_relations:
+            etag, last_modified = self.get_validators(self.get_queryset().filter(pk=instance.pk))
+        else:
+            values = {name: getattr(instance, name) for name in ("updated_at", *self.conditional_fields)}
+            etag, last_modified = self.get_etag(values), None if self.conditional_fields else instance.updated_at
+        response = self.get_conditional_response(etag, last_modified)
+        if response is None:
+            prefetch_related_objects([instance], *queryset._prefetch_related_lookups)
+            response = Response(self.get_serializer(instance).data)
+        return self.finalize_conditional_response(response, etag, last_modified)
+
+
+class CachedResponseMixin:
+    """
+    Caches rendered list and retrieve responses in the process until the data they show changes.
+
+    `get_cache_version_keys` returns keys of version counters which signals bump.
+    Values of the counters are a part of the cache key, so a write in any process
+    invalidates entries of all of them. Responses aren't cached without the keys.
+    Entries are evicted by LRU and `RESPONSE_CACHE_TTL`, the `X-Cache` header
+    tells if a response was cached.
+    """
+
+    cached_headers = ("ETag", "Last-Modified", "Cache-Control", "Vary")
+    response_cache_key: tuple | None = None
+
+    def get_cache_version_keys(self) -> list[str]:
+        return []
+
+    def get_visibility(self) -> str:
+        """Name of the group of users who see the same data."""
+        return self.request.user.role
+
+    def get_response_cache_key(self, version_keys: list[str]) -> tuple:
+        return (
+            self.request.build_absolute_uri(),
+            self.get_visibility(),
+            self.request.accepted_renderer.format,
+            *get_versions(version_keys),
+        )
+
+    def get_cached_response(self, request) -> HttpResponse | None:
+        version_keys = self.get_cache_version_keys()
+        if not version_keys:
+            # Nothing would invalidate the entry.
+            return None
+        key = self.get_response_cache_key(version_keys)
+        cached = response_cache.get(key)
+        if cached is None:
+            self.response_cache_key = key
+            return None
+        content, content_type, headers = cached
+        last_modified = parse_http_date_safe(headers.get("Last-Modified"))
+        response = get_conditional_response(request, etag=headers.get("ETag"), last_modified=last_modified)
+        if response is None:
+            response = HttpResponse(content, content_type=content_type)
+        for name, value in headers.items():
+            response[name] = value
+        response["X-Cache"] = "HIT"
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(request) or super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(request) or super().retrieve(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.response_cache_key is not None and response.status_code == status.HTTP_200_OK:
+            response.render()
+            headers = {name: response[name] for name in self.cached_headers if name in response}
+            cached = (response.content, response["Content-Type"], headers)
+            response_cache.set(self.response_cache_key, cached, settings.RESPONSE_CACHE_TTL)
+            response["X-Cache"] = "MISS"
+        return response
+
+
+class BulkCreateMixin:
+    """
+    Adds `POST bulk/` which creates objects from a JSON list in one request.
+
+    Permissions are checked once for the parent, objects are saved by `bulk_create`
+    of the service. Set `bulk_serializer_class` if items need another serializer
+    and override `get_bulk_create_kwargs` to pass the parent to the service.
+    """
+
+    bulk_serializer_class: type | None = None
+
+    def get_serializer_class(self):
+        if self.action == "bulk_create" and self.bulk_serializer_class:
+            return self.bulk_serializer_class
+        return super().get_serializer_class()
+
+    def get_bulk_create_kwargs(self) -> dict:
+        return {}
+
+    @action(detail=False, methods=["post"], url_path="bulk", parser_classes=(JSONParser,))
+    def bulk_create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(
+            data=request.data, many=True, allow_empty=False, max_length=settings.BULK_CREATE_MAX_SIZE
+        )
+        serializer.is_valid(raise_exception=True)
+        self.perform_bulk_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def perform_bulk_create(self, serializer):
+        service = self.get_service()
+        serializer.instance = service.bulk_create(serializer.validated_data, **self.get_bulk_create_kwargs())
+
+
+class QueryBudgetMixin:
+    """
+    Counts queries of a request against `query_budget`, a number or numbers by action.
+
+    Authentication isn't counted. With `QUERY_BUDGET_RAISE`, as in tests, requests
+    over budget raise `QueryBudgetError`, otherwise `QUERY_BUDGET_SAMPLE_RATE`
+    of requests are counted and violations are logged with SQL fingerprints.
+    Tests defer `on_commit` callbacks, in production callbacks of transactions
+    committed by the view are counted, budgets of writes leave room for them.
+    Queries of streaming responses run while their content is iterated, so they
+    are counted until the stream ends and the budget is checked after it.
+    """
+
+    query_budget: int | dict[str, int] | None = None
+    _query_counter: QueryCounter | None = None
+
+    def get_query_budget(self) -> int | None:
+        if isinstance(self.query_budget, dict):
+            return self.query_budget.get(self.action)
+        return self.query_budget
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.query_budget is None or not (
+            settings.QUERY_BUDGET_RAISE or random.random() < settings.QUERY_BUDGET_SAMPLE_RATE  # NOQA: S311
+        ):
+            return super().dispatch(request, *args, **kwargs)
+        self._query_counter = QueryCounter()
+        with connection.execute_wrapper(self._query_counter):
+            response = super().dispatch(request, *args, **kwargs)
+        if response.streaming:
+            response.streaming_content = self.count_stream_queries(request, response.streaming_content)
+        else:
+            self.check_query_budget(request)
+        return response
+
+    def count_stream_queries(self, request, content: Iterator[bytes]) -> Iterator[bytes]:
+        with connection.execute_wrapper(self._query_counter):
+            yield from content
+        self.check_query_budget(request)
+
+    def check_query_budget(self, request):
+        budget = self.get_query_budget()
+        if budget is not None and len(self._query_counter) > budget:
+            message = (
+                f"{request.method} {request.get_full_path()} made {len(self._query_counter)} queries, "
+                f"{type(self).__name__}.{self.action} budget is {budget}:\n{self._query_counter.report()}"
+            )
+            if settings.QUERY_BUDGET_RAISE:
+                raise QueryBudgetError(message)
+            logger.warning("Query budget exceeded: %s", message)
+
+    def perform_authentication(self, request):
+        super().perform_authentication(request)
+        if self._query_counter is not None:
+            self._query_counter.reset()
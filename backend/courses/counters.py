@@ -0,0 +1,14 @@
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Submission
+
+
+def actual_counters() -> dict:
+    """Expressions of `HomeWork.submission_count` and `graded_count` counted from submissions and grades."""
+    submissions = Submission.objects.filter(homework=OuterRef("pk")).order_by().values("homework")
+    graded = submissions.filter(grade__isnull=False)
+    return {
+        "submission_count": Coalesce(Subquery(submissions.annotate(n=Count("pk")).values("n")), Value(0)),
+        "graded_count": Coalesce(Subquery(graded.annotate(n=Count("pk")).values("n")), Value(0)),
+    }
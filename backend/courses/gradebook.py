@@ -0,0 +1,80 @@
+import csv
+from collections.abc import Iterable, Iterator
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Submission
+
+CHUNK_SIZE = 2000
+# Spreadsheets evaluate cells starting with these characters as formulas.
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+COLUMNS = {
+    "lecture_id": "homework__lecture_id",
+    "homework_id": "homework_id",
+    "submission_id": "id",
+    "student_id": "author_id",
+    "student": "author__username",
+    "submitted_at": "created_at",
+    "score": "grade__score",
+    "graded_by": "grade__author_id",
+    "graded_at": "grade__updated_at",
+}
+
+
+class Echo:
+    """A file-like object which returns written lines instead of buffering them."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def get_gradebook_rows(course_id: int, chunk_size: int = CHUNK_SIZE) -> Iterator[tuple]:
+    """Yields submissions of the course with their grades, fetched by a server-side cursor."""
+    return (
+        Submission.objects.filter(homework__lecture__course_id=course_id)
+        .order_by("homework__lecture_id", "homework_id", "id")
+        .values_list(*COLUMNS.values())
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def _batched(lines: Iterable[str], size: int) -> Iterator[str]:
+    """Joins lines to chunks, a chunk per row is too small for a socket write."""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+def escape_formula(value):
+    """Prefixes text which a spreadsheet would evaluate with a quote."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def stream_csv(rows: Iterable[tuple], chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    writer = csv.writer(Echo())
+
+    def lines():
+        yield writer.writerow(COLUMNS)
+        for row in rows:
+            yield writer.writerow([escape_formula(value) for value in row])
+
+    return _batched(lines(), chunk_size)
+
+
+def stream_ndjson(rows: Iterable[tuple], chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    return _batched((encoder.encode(dict(zip(COLUMNS, row, strict=True))) + "\n" for row in rows), chunk_size)
+
+
+EXPORT_FORMATS = {
+    "csv": (stream_csv, "text/csv"),
+    "ndjson": (stream_ndjson, "application/x-ndjson"),
+}
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Max, Q
+
+from courses.counters import actual_counters
+from courses.models import HomeWork
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes submission_count and graded_count of homeworks which drifted from their submissions and grades. "
+        "Homeworks are updated in batches of ids, each one in its own transaction, so rows are locked shortly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="Only count homeworks with drifted counters.")
+
+    def handle(self, *args, **options):
+        counters = actual_counters()
+        drifted = Q()
+        for name in counters:
+            drifted |= ~Q(**{name: F(f"actual_{name}")})
+        max_id = HomeWork.objects.aggregate(max_id=Max("id"))["max_id"] or 0
+        batch_size, total = options["batch_size"], 0
+        for start in range(0, max_id + 1, batch_size):
+            queryset = (
+                HomeWork.objects.filter(id__gte=start, id__lt=start + batch_size)
+                .alias(**{f"actual_{name}": expression for name, expression in counters.items()})
+                .filter(drifted)
+            )
+            total += queryset.count() if options["dry_run"] else queryset.update(**counters)
+        action = "have drifted counters" if options["dry_run"] else "repaired"
+        self.stdout.write(self.style.SUCCESS(f"{total} homeworks {action}."))
@@ -0,0 +1,113 @@
+from dataclasses import dataclass
+
+from django.contrib.postgres.expressions import ArraySubquery
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Func, IntegerField, OuterRef, Q
+
+from .models import Course
+
+COURSE_MEMBERSHIP_KEY = "course_membership:{}"
+USER_COURSES_KEY = "user_courses:{}"
+MEMBERSHIP_TIMEOUT = 60 * 60
+
+
+@dataclass(frozen=True)
+class CourseMembership:
+    """Author, teachers and students of a course."""
+
+    course_id: int
+    author_id: int
+    teacher_ids: frozenset[int]
+    student_ids: frozenset[int]
+
+    def is_staff(self, user_id: int) -> bool:
+        return user_id == self.author_id or user_id in self.teacher_ids
+
+    def is_member(self, user_id: int) -> bool:
+        return self.is_staff(user_id) or user_id in self.student_ids
+
+    @property
+    def user_ids(self) -> frozenset[int]:
+        return frozenset({self.author_id, *self.teacher_ids, *self.student_ids})
+
+
+@dataclass(frozen=True)
+class UserCourses:
+    """Courses a user teaches (as author or teacher) or attends."""
+
+    staff_course_ids: frozenset[int]
+    student_course_ids: frozenset[int]
+
+    @property
+    def course_ids(self) -> frozenset[int]:
+        return self.staff_course_ids | self.student_course_ids
+
+
+def member_ids(relation) -> ArraySubquery:
+    """Array of user ids of `Course.teachers` or `Course.students` to annotate courses with."""
+    field = relation.field
+    through = relation.through.objects.filter(**{field.m2m_field_name(): OuterRef("pk")})
+    return ArraySubquery(through.values(f"{field.m2m_reverse_field_name()}_id"))
+
+
+def member_count(relation) -> Func:
+    return Func(member_ids(relation), function="cardinality", output_field=IntegerField())
+
+
+def get_cached_course_membership(course_id: int) -> CourseMembership | None:
+    return cache.get(COURSE_MEMBERSHIP_KEY.format(course_id))
+
+
+def get_course_membership(course_id: int) -> CourseMembership | None:
+    """Returns membership of the course or None if the course doesn't exist."""
+    membership = get_cached_course_membership(course_id)
+    if membership is not None:
+        return membership
+    row = (
+        Course.objects.filter(pk=course_id)
+        .values_list("author_id", member_ids(Course.teachers), member_ids(Course.students))
+        .first()
+    )
+    if row is None:
+        return None
+    author_id, teacher_ids, student_ids = row
+    membership = CourseMembership(
+        course_id=int(course_id),
+        author_id=author_id,
+        teacher_ids=frozenset(teacher_ids),
+        student_ids=frozenset(student_ids),
+    )
+    cache.set(COURSE_MEMBERSHIP_KEY.format(course_id), membership, MEMBERSHIP_TIMEOUT)
+    return membership
+
+
+def get_user_courses(user_id: int) -> UserCourses:
+    key = USER_COURSES_KEY.format(user_id)
+    user_courses = cache.get(key)
+    if user_courses is not None:
+        return user_courses
+    staff_course_ids = Course.objects.filter(Q(author_id=user_id) | Q(teachers__id=user_id)).values_list(
+        "id", flat=True
+    )
+    student_course_ids = Course.objects.filter(students__id=user_id).values_list("id", flat=True)
+    user_courses = UserCourses(
+        staff_course_ids=frozenset(staff_course_ids),
+        student_course_ids=frozenset(student_course_ids),
+    )
+    cache.set(key, user_courses, MEMBERSHIP_TIMEOUT)
+    return user_courses
+
+
+def _delete(keys: list[str]):
+    cache.delete_many(keys)
+    # Readers may cache the old state before the transaction is committed.
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_course_membership(course_ids):
+    _delete([COURSE_MEMBERSHIP_KEY.format(course_id) for course_id in course_ids])
+
+
+def invalidate_user_courses(user_ids):
+    _delete([USER_COURSES_KEY.format(user_id) for user_id in user_ids])
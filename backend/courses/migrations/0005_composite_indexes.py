@@ -0,0 +1,72 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_historicalcomment_historicalcourse_historicalgrade_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Composite indexes replace single column ones of the foreign keys.
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['grade', 'id'], name='comment_grade_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='homework',
+            index=models.Index(fields=['lecture', 'id'], name='homework_lecture_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='homework',
+            index=models.Index(fields=['author', 'id'], name='homework_author_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lecture',
+            index=models.Index(fields=['course', 'id'], name='lecture_course_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['homework', 'author'], name='submission_homework_author_idx'),
+        ),
+        migrations.RunSQL(
+            sql=[
+                'CREATE INDEX course_students_user_course_idx ON courses_course_students (customuser_id, course_id);',
+                'CREATE INDEX course_teachers_user_course_idx ON courses_course_teachers (customuser_id, course_id);',
+            ],
+            reverse_sql=[
+                'DROP INDEX course_students_user_course_idx;',
+                'DROP INDEX course_teachers_user_course_idx;',
+            ],
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='grade',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='courses.grade', verbose_name='Grade'),
+        ),
+        migrations.AlterField(
+            model_name='homework',
+            name='author',
+            field=models.ForeignKey(db_index=False, limit_choices_to={'role': 'TEACHER'}, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Author'),
+        ),
+        migrations.AlterField(
+            model_name='homework',
+            name='lecture',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='homeworks', to='courses.lecture', verbose_name='Lecture'),
+        ),
+        migrations.AlterField(
+            model_name='lecture',
+            name='course',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='lectures', to='courses.course', verbose_name='Course'),
+        ),
+        migrations.AlterField(
+            model_name='submission',
+            name='homework',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to='courses.homework', verbose_name='HomeWork'),
+        ),
+    ]
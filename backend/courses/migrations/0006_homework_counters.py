@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:28
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    HomeWork = apps.get_model('courses', 'HomeWork')
+    Submission = apps.get_model('courses', 'Submission')
+    submissions = Submission.objects.filter(homework=OuterRef('pk')).order_by().values('homework')
+    graded = submissions.filter(grade__isnull=False)
+    HomeWork.objects.update(
+        submission_count=Coalesce(Subquery(submissions.annotate(n=Count('pk')).values('n')), Value(0)),
+        graded_count=Coalesce(Subquery(graded.annotate(n=Count('pk')).values('n')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='homework',
+            name='graded_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Number of graded submissions'),
+        ),
+        migrations.AddField(
+            model_name='homework',
+            name='submission_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Number of submissions'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.db import models
-from simple_history.models import HistoricalRecords
 
+from core.history import BufferedHistoricalRecords
 from core.models import DatedModel
 
 User = get_user_model()
@@ -19,11 +19,18 @@ class Course(DatedModel):
     students = models.ManyToManyField(
         User, blank=True, related_name='student_courses', limit_choices_to={'role': 'STUDENT'}, verbose_name='Students'
     )
-    history = HistoricalRecords()
+    history = BufferedHistoricalRecords()
 
     def __str__(self) -> str:
         return f'{self.__class__.__name__}:{self.id}:{self.title}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Signals compare it with the saved author to update cached memberships.
+        instance._loaded_author_id = instance.__dict__.get('author_id')
+        return instance
+
     class Meta:
         verbose_name = 'Course'
         verbose_name_plural = 'Courses'
@@ -32,14 +39,16 @@ class Course(DatedModel):
 
 class Lecture(DatedModel):
 
-    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='lectures', verbose_name='Course')
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name='lectures', db_index=False, verbose_name='Course'
+    )
     topic = models.CharField(max_length=255, verbose_name='Topic')
     teacher = models.ForeignKey(
         User, on_delete=models.CASCADE, limit_choices_to={'role': 'TEACHER'}, verbose_name='Teacher'
     )
     presentation_file = models.FileField(blank=True, null=True, verbose_name='Presentation file')
     datetime = models.DateTimeField(blank=True, null=True, verbose_name='Schedulled date and time')
-    history = HistoricalRecords()
+    history = BufferedHistoricalRecords()
 
     def __str__(self) -> str:
         return f'{self.__class__.__name__}:{self.id}:{self.topic}'
@@ -48,16 +57,24 @@ class Lecture(DatedModel):
         verbose_name = 'Lecture'
         verbose_name_plural = 'Lectures'
         ordering = ('id',)
+        indexes = (
+            models.Index(fields=('course', 'id'), name='lecture_course_id_idx'),
+        )
 
 
 class HomeWork(DatedModel):
 
     text = models.TextField(verbose_name='Text')
-    lecture = models.ForeignKey(Lecture, on_delete=models.CASCADE, related_name='homeworks', verbose_name='Lecture')
+    lecture = models.ForeignKey(
+        Lecture, on_delete=models.CASCADE, related_name='homeworks', db_index=False, verbose_name='Lecture'
+    )
     author = models.ForeignKey(
-        User, on_delete=models.CASCADE, limit_choices_to={'role': 'TEACHER'}, verbose_name='Author'
+        User, on_delete=models.CASCADE, limit_choices_to={'role': 'TEACHER'}, db_index=False, verbose_name='Author'
     )
-    history = HistoricalRecords()
+    # Updated by SubmissionService and GradingService, repaired by `repair_homework_counters`.
+    submission_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Number of submissions')
+    graded_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Number of graded submissions')
+    history = BufferedHistoricalRecords(excluded_fields=('submission_count', 'graded_count'))
 
     def __str__(self) -> str:
         return f'{self.__class__.__name__}:{self.id}:{self.text[:20]}'
@@ -66,6 +83,10 @@ class HomeWork(DatedModel):
         verbose_name = 'Homework'
         verbose_name_plural = 'Homeworks'
         ordering = ('id',)
+        indexes = (
+            models.Index(fields=('lecture', 'id'), name='homework_lecture_id_idx'),
+            models.Index(fields=('author', 'id'), name='homework_author_id_idx'),
+        )
 
 
 class Submission(DatedModel):
@@ -76,9 +97,9 @@ class Submission(DatedModel):
         related_name='submissions', verbose_name='Author'
     )
     homework = models.ForeignKey(
-        HomeWork, on_delete=models.CASCADE, related_name='submissions', verbose_name='HomeWork'
+        HomeWork, on_delete=models.CASCADE, related_name='submissions', db_index=False, verbose_name='HomeWork'
     )
-    history = HistoricalRecords()
+    history = BufferedHistoricalRecords()
 
     def __str__(self) -> str:
         return f'{self.__class__.__name__}:{self.id} Student:{self.author_id} HW:{self.homework_id}'
@@ -87,6 +108,9 @@ class Submission(DatedModel):
         verbose_name = 'Submission'
         verbose_name_plural = 'Submissions'
         ordering = ('id',)
+        indexes = (
+            models.Index(fields=('homework', 'author'), name='submission_homework_author_idx'),
+        )
 
 
 class Grade(DatedModel):
@@ -99,7 +123,7 @@ class Grade(DatedModel):
         User, on_delete=models.CASCADE, limit_choices_to={'role': 'TEACHER'},
         related_name='teacher_grades', verbose_name='Author'
     )
-    history = HistoricalRecords()
+    history = BufferedHistoricalRecords()
 
     def __str__(self) -> str:
         return f'{self.__class__.__name__}: {self.submission_id} Score: {self.score} Author:{self.author_id}'
@@ -113,9 +137,11 @@ class Grade(DatedModel):
 class Comment(DatedModel):
 
     text = models.TextField(verbose_name='Text')
-    grade = models.ForeignKey(Grade, on_delete=models.CASCADE, related_name='comments', verbose_name='Grade')
+    grade = models.ForeignKey(
+        Grade, on_delete=models.CASCADE, related_name='comments', db_index=False, verbose_name='Grade'
+    )
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comments', verbose_name='Author')
-    history = HistoricalRecords()
+    history = BufferedHistoricalRecords()
 
     def __str__(self) -> str:
         return f'{self.__class__.__name__}:{self.id} Grade:{self.grade_id} Author:{self.author_id}'
@@ -124,3 +150,6 @@ class Comment(DatedModel):
         verbose_name = 'Comment'
         verbose_name_plural = 'Comments'
         ordering = ('id',)
+        indexes = (
+            models.Index(fields=('grade', 'id'), name='comment_grade_id_idx'),
+        )
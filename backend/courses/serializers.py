@@ -1,14 +1,50 @@
+from functools import cached_property
 from typing import ClassVar
 
 from django.contrib.auth import get_user_model
-from rest_framework import serializers
+from django.utils import timezone
+from rest_framework import permissions, serializers
 
 from .models import Comment, Course, Grade, HomeWork, Lecture, Submission
 
 User = get_user_model()
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Renders only fields from `?fields=`, or all but fields from `?omit=`, of the request.
+
+    Only the top level serializer of safe requests is trimmed, nested serializers
+    render all of their fields.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+        parent = self.parent.parent if isinstance(self.parent, serializers.ListSerializer) else self.parent
+        if request is None or parent is not None or request.method not in permissions.SAFE_METHODS:
+            return fields
+        if "fields" in request.query_params:
+            keep = set(request.query_params["fields"].split(","))
+            fields = {name: field for name, field in fields.items() if name in keep}
+        if "omit" in request.query_params:
+            omit = set(request.query_params["omit"].split(","))
+            fields = {name: field for name, field in fields.items() if name not in omit}
+        return fields
+
+
+class MemoizedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Looks every primary key up once, items of a bulk payload usually repeat a few of them."""
+
+    def to_internal_value(self, data):
+        objects = self.__dict__.setdefault("_objects", {})
+        key = str(data)
+        if key not in objects:
+            objects[key] = super().to_internal_value(data)
+        return objects[key]
+
+
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         api_object_name = "comment"
         model = Comment
@@ -27,7 +63,7 @@ class CommentSerializer(serializers.ModelSerializer):
         )
 
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         api_object_name = "course"
         model = Course
@@ -52,7 +88,53 @@ class CourseSerializer(serializers.ModelSerializer):
         }
 
 
-class LectureSerializer(serializers.ModelSerializer):
+class CourseListSerializer(SparseFieldsMixin, serializers.Serializer):
+    """
+    Course in lists, read from `.values()` rows.
+
+    Member lists are replaced with counts, names from `expand` of the context add them back.
+    """
+
+    # Expandable field -> key of its ids in the row.
+    expandable_fields: ClassVar[dict] = {"teachers": "teacher_ids", "students": "student_ids"}
+    datetime_fields: ClassVar[set] = {"created_at", "updated_at"}
+
+    id = serializers.IntegerField(read_only=True)
+    title = serializers.CharField(read_only=True)
+    author = serializers.IntegerField(read_only=True)
+    teacher_count = serializers.IntegerField(read_only=True)
+    student_count = serializers.IntegerField(read_only=True)
+    teachers = serializers.ListField(child=serializers.IntegerField(), source="teacher_ids", read_only=True)
+    students = serializers.ListField(child=serializers.IntegerField(), source="student_ids", read_only=True)
+    created_at = serializers.DateTimeField(read_only=True)
+    updated_at = serializers.DateTimeField(read_only=True)
+
+    class Meta:
+        api_object_name = "course"
+
+    def get_fields(self):
+        fields = super().get_fields()
+        expand = self.context.get("expand", ())
+        for name in self.expandable_fields:
+            if name not in expand:
+                fields.pop(name, None)
+        return fields
+
+    @cached_property
+    def timezone(self):
+        return timezone.get_current_timezone()
+
+    def to_representation(self, instance):
+        # Values of the row are ready to be rendered except datetimes, which are
+        # formatted like DateTimeField does with the timezone looked up once.
+        data = {name: instance[field.source] for name, field in self.fields.items()}
+        for name in self.datetime_fields & data.keys():
+            value = data[name].astimezone(self.timezone).isoformat()
+            data[name] = value[:-6] + "Z" if value.endswith("+00:00") else value
+        return data
+
+
+class LectureSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         api_object_name = "lecture"
         model = Lecture
@@ -74,7 +156,16 @@ class LectureSerializer(serializers.ModelSerializer):
         )
 
 
-class GradeSerializer(serializers.ModelSerializer):
+class LectureBulkSerializer(LectureSerializer):
+    """Lecture from a JSON list, presentation files are uploaded one by one."""
+
+    teacher = MemoizedPrimaryKeyRelatedField(queryset=User.objects.filter(role="TEACHER"))
+
+    class Meta(LectureSerializer.Meta):
+        fields = tuple(field for field in LectureSerializer.Meta.fields if field != "presentation_file")
+
+
+class GradeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     id = serializers.IntegerField(source="submission_id", read_only=True)
 
     class Meta:
@@ -95,7 +186,20 @@ class GradeSerializer(serializers.ModelSerializer):
         )
 
 
-class SubmissionSerializer(serializers.ModelSerializer):
+class GradeBulkSerializer(serializers.ModelSerializer):
+    """Grade of one submission in a bulk grading request."""
+
+    submission_id = serializers.IntegerField()
+
+    class Meta:
+        model = Grade
+        fields = (
+            "submission_id",
+            "score",
+        )
+
+
+class SubmissionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     grade = GradeSerializer(read_only=True)
 
     class Meta:
@@ -120,7 +224,7 @@ class SubmissionSerializer(serializers.ModelSerializer):
         )
 
 
-class HomeWorkSerializer(serializers.ModelSerializer):
+class HomeWorkSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         api_object_name = "homework"
         model = HomeWork
@@ -128,6 +232,8 @@ class HomeWorkSerializer(serializers.ModelSerializer):
             "id",
             "text",
             "lecture",
+            "submission_count",
+            "graded_count",
             "author",
             "created_at",
             "updated_at",
@@ -135,13 +241,15 @@ class HomeWorkSerializer(serializers.ModelSerializer):
         read_only_fields = (
             "id",
             "lecture",
+            "submission_count",
+            "graded_count",
             "author",
             "created_at",
             "updated_at",
         )
 
 
-class MyHomeWorkSerializer(serializers.ModelSerializer):
+class MyHomeWorkSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     submissions = SubmissionSerializer(many=True)
 
     class Meta:
@@ -1,9 +1,33 @@
+from collections import Counter
+
 from django.db import transaction
+from django.db.models import F, Q, QuerySet
+from django.db.models.functions import Greatest
 from django.db.utils import IntegrityError
+from simple_history.utils import bulk_create_with_history
 
+from api.v1.notifications import BulkNotificationSenderV1
 from core.exceptions import Conflict
 from core.services import AuthorService
 from courses.models import Comment, Course, Grade, HomeWork, Lecture, Submission
+from courses.versions import bump_course_stats_versions, bump_course_versions
+
+
+def notify_bulk_create(objs):
+    """Sends one notification for all objects created by `bulk_create`, signals are not sent for them."""
+    if objs:
+        BulkNotificationSenderV1(instance=objs).send()
+
+
+def add_to_homework_counters(homeworks: Q, submissions: int = 0, graded: int = 0):
+    """Adds numbers to counters of the homeworks with one UPDATE, counters which drifted stop at zero."""
+    counters = {}
+    if submissions:
+        counters["submission_count"] = Greatest(F("submission_count") + submissions, 0)
+    if graded:
+        counters["graded_count"] = Greatest(F("graded_count") + graded, 0)
+    if counters:
+        HomeWork.objects.filter(homeworks).update(**counters)
 
 
 class CourseService(AuthorService):
@@ -42,30 +66,139 @@ class LectureService(AuthorService):
     def create(self, *args, **kwargs):
         return self.model.objects.create(*args, **kwargs)
 
+    def bulk_create(self, items, **kwargs):
+        objs = [self.model(**kwargs, **item) for item in items]
+        objs = bulk_create_with_history(objs, self.model, default_user=self.author)
+        # bulk_create doesn't send post_save.
+        bump_course_versions({obj.course_id for obj in objs})
+        notify_bulk_create(objs)
+        return objs
+
 
 class HomeWorkService(AuthorService):
     """A service class to handle business logic related to homeworks."""
 
     model = HomeWork
 
+    def bulk_create(self, items, **kwargs):
+        objs = super().bulk_create(items, **kwargs)
+        bump_course_stats_versions(Q(pk__in={obj.lecture_id for obj in objs}))
+        notify_bulk_create(objs)
+        return objs
+
 
 class SubmissionService(AuthorService):
     """A service class to handle business logic related to submissions."""
 
     model = Submission
 
+    @transaction.atomic
+    def create(self, **kwargs):
+        submission = super().create(**kwargs)
+        add_to_homework_counters(Q(pk=submission.homework_id), submissions=1)
+        return submission
+
+    @transaction.atomic
+    def bulk_create(self, items, **kwargs):
+        objs = super().bulk_create(items, **kwargs)
+        for homework_id, count in Counter(obj.homework_id for obj in objs).items():
+            add_to_homework_counters(Q(pk=homework_id), submissions=count)
+        bump_course_stats_versions(Q(homeworks__in={obj.homework_id for obj in objs}))
+        for obj in objs:
+            # New submissions have no grade, don't query it for every one of them.
+            Submission.grade.related.set_cached_value(obj, None)
+        notify_bulk_create(objs)
+        return objs
+
+    @transaction.atomic
+    def delete(self, instance):
+        _, deleted = instance.delete()
+        add_to_homework_counters(Q(pk=instance.homework_id), submissions=-1, graded=-deleted.get(Grade._meta.label, 0))
+
 
 class GradingService(AuthorService):
     """A service class to handle business logic related to gradings."""
 
     model = Grade
 
+    @staticmethod
+    def lock_submissions(submissions: QuerySet):
+        """Grades of the submissions are created one request at a time, until the transaction is committed."""
+        list(submissions.select_for_update(no_key=True).order_by("pk").values_list("pk", flat=True))
+
+    @transaction.atomic
     def create(self, **kwargs) -> Grade:
+        self.lock_submissions(Submission.objects.filter(pk=kwargs["submission"].pk))
         try:
-            return super().create(**kwargs)
+            grade = super().create(**kwargs)
         except IntegrityError as e:
             submission = kwargs.get("submission")
             raise Conflict(f"Submission {submission.pk} already has a Grade.") from e
+        add_to_homework_counters(Q(submissions=grade.submission_id), graded=1)
+        return grade
+
+    @transaction.atomic
+    def delete(self, instance):
+        super().delete(instance)
+        add_to_homework_counters(Q(submissions=instance.submission_id), graded=-1)
+
+    @transaction.atomic
+    def bulk_upsert(self, homework: HomeWork, items: list[dict]) -> dict:
+        """
+        Creates or updates grades of the homework submissions in one INSERT ... ON CONFLICT.
+
+        Items of unknown submissions, repeated submissions and grades of other teachers
+        are not saved and returned in `conflicts` with their index in `items`.
+        """
+        submission_ids = {item["submission_id"] for item in items}
+        submissions = Submission.objects.filter(homework=homework, pk__in=submission_ids)
+        # Grades are read by another query, so it sees ones committed while the lock was awaited.
+        self.lock_submissions(submissions)
+        existing = {
+            pk: (author_id, created_at)
+            for pk, author_id, created_at in submissions.values_list("pk", "grade__author_id", "grade__created_at")
+        }
+        grades, conflicts, seen = {}, [], set()
+        for index, item in enumerate(items):
+            submission_id = item["submission_id"]
+            if submission_id not in existing:
+                detail = f"Submission {submission_id} is not found in HomeWork {homework.pk}."
+            elif submission_id in seen:
+                detail = f"Submission {submission_id} is repeated."
+            elif existing[submission_id][0] not in (None, self.author.pk):
+                detail = f"Submission {submission_id} is graded by another teacher."
+            else:
+                detail = None
+            seen.add(submission_id)
+            if detail:
+                conflicts.append({"index": index, "submission_id": submission_id, "detail": detail})
+                continue
+            grades[submission_id] = self.model(submission_id=submission_id, score=item["score"], author=self.author)
+        self.model.objects.bulk_create(
+            grades.values(),
+            update_conflicts=True,
+            unique_fields=["submission"],
+            update_fields=["score", "author", "updated_at"],
+        )
+        created, updated = [], []
+        for grade in grades.values():
+            author_id, created_at = existing[grade.submission_id]
+            if author_id is None:
+                created.append(grade)
+            else:
+                # The INSERT keeps created_at of the existing row, history should have it too.
+                grade.created_at = created_at
+                updated.append(grade)
+        for objs, update in ((created, False), (updated, True)):
+            if objs:
+                self.model.history.bulk_history_create(objs, update=update, default_user=self.author)
+        add_to_homework_counters(Q(pk=homework.pk), graded=len(created))
+        bump_course_stats_versions(Q(homeworks=homework.pk))
+        return {
+            "created": [grade.submission_id for grade in created],
+            "updated": [grade.submission_id for grade in updated],
+            "conflicts": conflicts,
+        }
 
 
 class CommentService(AuthorService):
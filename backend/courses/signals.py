@@ -1,10 +1,18 @@
-from django.db.models.signals import post_save
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
 
-from api.v1.notifications import NotificationSenderV1
+from api.v1.notifications import NotificationSenderV1, notify_courses_changed
 from project.constants import EventEnum
 
-from .models import Course
+from .membership import (
+    get_course_membership,
+    invalidate_course_membership,
+    invalidate_user_courses,
+)
+from .models import Course, Grade, HomeWork, Lecture, Submission
+from .versions import bump_course_list_version, bump_course_stats_versions, bump_course_versions
 
 
 @receiver(post_save, sender=Course)
@@ -12,3 +20,96 @@ def course_post_save(sender, instance, created, **kwargs):
     event = EventEnum.CREATE if created else EventEnum.UPDATE
     sender = NotificationSenderV1(instance=instance, event=event)
     sender.send()
+
+
+@receiver(pre_save, sender=Course)
+def course_membership_pre_save(sender, instance, raw, **kwargs):
+    if raw or instance.pk is None or instance.__dict__.get("_loaded_author_id") is not None:
+        return
+    # The course wasn't loaded from the database or its author was deferred.
+    instance._loaded_author_id = Course.objects.filter(pk=instance.pk).values_list("author_id", flat=True).first()
+
+
+@receiver(post_save, sender=Course)
+def course_membership_post_save(sender, instance, created, **kwargs):
+    old_author_id = instance.__dict__.get("_loaded_author_id")
+    instance._loaded_author_id = instance.author_id
+    if created:
+        invalidate_user_courses([instance.author_id])
+        notify_courses_changed([instance.author_id])
+        return
+    if old_author_id is not None and old_author_id != instance.author_id:
+        invalidate_course_membership([instance.pk])
+        invalidate_user_courses([old_author_id, instance.author_id])
+        notify_courses_changed([old_author_id, instance.author_id])
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def course_version_changed(sender, instance, **kwargs):
+    bump_course_list_version()
+    bump_course_versions([instance.pk])
+
+
+@receiver(post_save, sender=Lecture)
+@receiver(post_delete, sender=Lecture)
+def lecture_version_changed(sender, instance, **kwargs):
+    bump_course_versions([instance.course_id])
+
+
+@receiver(post_save, sender=HomeWork)
+@receiver(post_delete, sender=HomeWork)
+def homework_stats_changed(sender, instance, **kwargs):
+    bump_course_stats_versions(Q(pk=instance.lecture_id))
+
+
+@receiver(post_save, sender=Submission)
+@receiver(post_delete, sender=Submission)
+def submission_stats_changed(sender, instance, **kwargs):
+    bump_course_stats_versions(Q(homeworks=instance.homework_id))
+
+
+@receiver(post_save, sender=Grade)
+@receiver(post_delete, sender=Grade)
+def grade_stats_changed(sender, instance, **kwargs):
+    # Grades deleted with their submission are handled by the submission.
+    bump_course_stats_versions(Q(homeworks__submissions=instance.submission_id))
+
+
+@receiver(pre_delete, sender=Course)
+def course_membership_pre_delete(sender, instance, **kwargs):
+    membership = get_course_membership(instance.pk)
+    if membership is not None:
+        invalidate_user_courses(membership.user_ids)
+        notify_courses_changed(membership.user_ids)
+
+
+@receiver(post_delete, sender=Course)
+def course_membership_post_delete(sender, instance, **kwargs):
+    invalidate_course_membership([instance.pk])
+
+
+@receiver(m2m_changed, sender=Course.teachers.through)
+@receiver(m2m_changed, sender=Course.students.through)
+def course_members_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    # Both relations share column names of the through table.
+    course_field = Course.teachers.field.m2m_field_name()
+    user_field = Course.teachers.field.m2m_reverse_field_name()
+    if reverse:
+        if action == "pre_clear":
+            pk_set = sender.objects.filter(**{user_field: instance.pk}).values_list(course_field, flat=True)
+        course_ids, user_ids = set(pk_set), {instance.pk}
+    else:
+        if action == "pre_clear":
+            pk_set = sender.objects.filter(**{course_field: instance.pk}).values_list(user_field, flat=True)
+        course_ids, user_ids = {instance.pk}, set(pk_set)
+    invalidate_course_membership(course_ids)
+    invalidate_user_courses(user_ids)
+    notify_courses_changed(user_ids)
+    # Courses render their members, ETag and Last-Modified come from `updated_at`.
+    Course.objects.filter(pk__in=course_ids).update(updated_at=timezone.now())
+    # Lists show numbers of members.
+    bump_course_list_version()
+    bump_course_versions(course_ids)
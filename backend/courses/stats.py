@@ -0,0 +1,131 @@
+from django.contrib.postgres.fields import ArrayField
+from django.core.cache import cache
+from django.db.models import Aggregate, Avg, Count, FloatField, Q
+
+from core.cache import get_versions
+
+from .membership import CourseMembership
+from .models import Grade, HomeWork, Submission
+from .versions import COURSE_STATS_VERSION_KEY, COURSE_VERSION_KEY
+
+COURSE_STATS_KEY = "course_stats:{}:{}:{}"
+STATS_TIMEOUT = 60 * 60
+PERCENTILES = (0.25, 0.5, 0.75, 0.9)
+# Lower bounds of histogram bins, the last bin has no upper one.
+HISTOGRAM_EDGES = tuple(range(0, 100, 10))
+
+
+class PercentileCont(Aggregate):
+    """Continuous percentiles of the expression, an array in order of `percentiles`."""
+
+    function = "percentile_cont"
+    template = "%(function)s(ARRAY[%(percentiles)s]) WITHIN GROUP (ORDER BY %(expressions)s)"
+
+    def __init__(self, expression, percentiles: tuple[float, ...], **extra):
+        percentiles = ", ".join(str(float(percentile)) for percentile in percentiles)
+        super().__init__(expression, percentiles=percentiles, output_field=ArrayField(FloatField()), **extra)
+
+
+def score_aggregates(score: str) -> dict:
+    """Mean, percentiles and histogram bins of the `score` lookup, computed by the same GROUP BY."""
+    aggregates = {"mean": Avg(score), "percentiles": PercentileCont(score, PERCENTILES)}
+    for index, low in enumerate(HISTOGRAM_EDGES):
+        condition = Q(**{f"{score}__gte": low})
+        if index + 1 < len(HISTOGRAM_EDGES):
+            condition &= Q(**{f"{score}__lt": HISTOGRAM_EDGES[index + 1]})
+        aggregates[f"bin_{index}"] = Count(score, filter=condition)
+    return aggregates
+
+
+def format_scores(row: dict) -> dict:
+    percentiles = row["percentiles"] or [None] * len(PERCENTILES)
+    return {
+        "mean": None if row["mean"] is None else round(row["mean"], 2),
+        "median": percentiles[PERCENTILES.index(0.5)],
+        "percentiles": {f"p{round(p * 100)}": value for p, value in zip(PERCENTILES, percentiles, strict=True)},
+        "histogram": [
+            {
+                "min": low,
+                "max": HISTOGRAM_EDGES[index + 1] if index + 1 < len(HISTOGRAM_EDGES) else None,
+                "count": row[f"bin_{index}"],
+            }
+            for index, low in enumerate(HISTOGRAM_EDGES)
+        ],
+    }
+
+
+def _rate(count: int, total: int) -> float | None:
+    return round(count / total, 4) if total else None
+
+
+def _student_stats(student_id: int, row: dict, homework_count: int) -> dict:
+    return {
+        "student_id": student_id,
+        "submission_count": row["submitted"],
+        "graded_count": row["graded"],
+        "submission_rate": _rate(row["submitted"], homework_count),
+        "scores": format_scores(row),
+    }
+
+
+def compute_course_stats(membership: CourseMembership) -> dict:
+    """Score distributions of the course, its homeworks and students, by three aggregate queries."""
+    course_id, student_ids = membership.course_id, membership.student_ids
+    homeworks = list(
+        HomeWork.objects.filter(lecture__course_id=course_id)
+        .order_by("lecture_id", "id")
+        .values("id", "lecture_id")
+        .annotate(
+            submitted=Count("submissions"),
+            students_submitted=Count(
+                "submissions__author", distinct=True, filter=Q(submissions__author__in=student_ids)
+            ),
+            graded=Count("submissions__grade"),
+            **score_aggregates("submissions__grade__score"),
+        )
+    )
+    students = {
+        row["author_id"]: row
+        for row in Submission.objects.filter(homework__lecture__course_id=course_id, author__in=student_ids)
+        .order_by()
+        .values("author_id")
+        .annotate(submitted=Count("homework", distinct=True), graded=Count("grade"), **score_aggregates("grade__score"))
+    }
+    course = Grade.objects.filter(submission__homework__lecture__course_id=course_id).aggregate(
+        **score_aggregates("score")
+    )
+    empty = {"submitted": 0, "graded": 0, "mean": None, "percentiles": None}
+    empty |= {f"bin_{index}": 0 for index in range(len(HISTOGRAM_EDGES))}
+    return {
+        "course_id": course_id,
+        "student_count": len(student_ids),
+        "homework_count": len(homeworks),
+        "scores": format_scores(course),
+        "homeworks": [
+            {
+                "homework_id": row["id"],
+                "lecture_id": row["lecture_id"],
+                "submission_count": row["submitted"],
+                "graded_count": row["graded"],
+                "submission_rate": _rate(row["students_submitted"], len(student_ids)),
+                "scores": format_scores(row),
+            }
+            for row in homeworks
+        ],
+        "students": [
+            _student_stats(student_id, students.get(student_id, empty), len(homeworks))
+            for student_id in sorted(student_ids)
+        ],
+    }
+
+
+def get_course_stats(membership: CourseMembership) -> dict:
+    """Cached statistics, versions are bumped by changes of lectures, members, homeworks, submissions and grades."""
+    course_id = membership.course_id
+    versions = get_versions([COURSE_VERSION_KEY.format(course_id), COURSE_STATS_VERSION_KEY.format(course_id)])
+    key = COURSE_STATS_KEY.format(course_id, *versions)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_course_stats(membership)
+        cache.set(key, stats, STATS_TIMEOUT)
+    return stats
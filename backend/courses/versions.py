@@ -0,0 +1,41 @@
+from django.db import transaction
+from django.db.models import Q
+
+from core.cache import bump_versions
+
+from .models import Lecture
+
+COURSE_LIST_VERSION_KEY = "course_list_version"
+COURSE_VERSION_KEY = "course_version:{}"
+COURSE_STATS_VERSION_KEY = "course_stats_version:{}"
+
+
+def _bump(keys: list[str]):
+    bump_versions(keys)
+    # Readers may cache the old state before the transaction is committed.
+    transaction.on_commit(lambda: bump_versions(keys))
+
+
+def bump_course_list_version():
+    """Invalidates cached course lists."""
+    _bump([COURSE_LIST_VERSION_KEY])
+
+
+def bump_course_versions(course_ids):
+    """Invalidates cached responses of the courses and their lectures."""
+    _bump([COURSE_VERSION_KEY.format(course_id) for course_id in course_ids])
+
+
+def bump_course_stats_versions(lectures: Q):
+    """
+    Invalidates statistics of courses of the lectures.
+
+    Courses are looked up after commit, writes of homeworks, submissions and grades
+    don't wait for it. Statistics computed before the commit have an old version.
+    """
+
+    def bump():
+        course_ids = Lecture.objects.filter(lectures).values_list("course_id", flat=True).distinct()
+        bump_versions([COURSE_STATS_VERSION_KEY.format(course_id) for course_id in course_ids])
+
+    transaction.on_commit(bump)
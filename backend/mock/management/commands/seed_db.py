@@ -1,19 +1,22 @@
+import csv
+import io
 import random
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from datetime import UTC
+from itertools import batched
 
-import factory
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
 from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max, Model
+from django.test import override_settings
+from django.utils import timezone
+from faker import Faker
 
 from courses.models import Comment, Course, Grade, HomeWork, Lecture, Submission, User
-from mock.factories import (
-    CommentFactory,
-    CourseFactory,
-    GradeFactory,
-    HomeWorkFactory,
-    LectureFactory,
-    SubmissionFactory,
-    UserFactory,
-)
 
 NUM_STUDENTS = 1000
 NUM_TEACHERS = 100
@@ -23,76 +26,264 @@ NUM_HOMEWORKS = 2000
 NUM_SUBMISSIONS = 2000
 NUM_GRADES = 1000
 NUM_COMMENTS = 5000
+TEACHERS_PER_COURSE = 3
+STUDENTS_PER_COURSE = 50
+# Submissions fill homeworks one by one, so lists of submissions are as long as a course's.
+SUBMISSIONS_PER_HOMEWORK = STUDENTS_PER_COURSE
+PASSWORD = "password123"  # NOQA: S105
+# Texts are picked from pools, Faker is too slow to generate millions of them.
+POOL_SIZE = 1000
+COPY_NULL = r"\N"
+
+COURSE_MODELS = (Comment, Grade, Submission, HomeWork, Lecture, Course)
 
 
 class Command(BaseCommand):
-    help = "Fills the database with mock data."
+    help = (
+        "Fills the database with mock data. Objects get ids in memory and are inserted in batches "
+        "by bulk_create or COPY, so --scale 100 and more takes minutes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", type=float, default=1, help="Multiplies the number of objects.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--copy", action="store_true", help="Load rows by COPY instead of bulk_create.")
+        parser.add_argument("--no-history", action="store_true", help="Don't create historical rows.")
 
-    @transaction.atomic
     def handle(self, *args, **options):
-        self.stdout.write("Deleting old data...")
-        models = [Comment, Grade, Submission, HomeWork, Lecture, Course]
-        for m in models:
-            m.objects.all().delete()
-        User.objects.filter(is_superuser=False, is_staff=False).delete()
-        self.stdout.write(self.style.SUCCESS("Old data has been successfully deleted."))
-
-        self.stdout.write("Creating new data...")
-
-        self.stdout.write(f"Creating {NUM_STUDENTS} students and {NUM_TEACHERS} teachers...")
-        students = UserFactory.create_batch(NUM_STUDENTS, role="STUDENT")
-        teachers = UserFactory.create_batch(NUM_TEACHERS, role="TEACHER")
-        all_users = students + teachers
-
-        self.stdout.write(f"Creating {NUM_COURSES} courses...")
-        courses = CourseFactory.create_batch(NUM_COURSES, author=factory.Iterator(teachers))
-
-        for course in courses:
-            course_teachers = random.sample(teachers, k=min(len(teachers), 3))
-            course_students = random.sample(students, k=min(len(students), 50))
-            course.teachers.add(*course_teachers)
-            course.students.add(*course_students)
-
-        self.stdout.write(f"Creating {NUM_LECTURES} lectures...")
-        lectures = []
-        for _ in range(NUM_LECTURES):
-            course = random.choice(courses)  # NOQA: S311
-            course_teachers = list(course.teachers.all())
-            if not course_teachers:
-                course_teachers = teachers
-            teacher = random.choice(course_teachers)  # NOQA: S311
-            lectures.append(LectureFactory(course=course, teacher=teacher))
-
-        self.stdout.write(f"Creating {NUM_HOMEWORKS} homworks...")
-        HomeWorkFactory.create_batch(
-            NUM_HOMEWORKS,
-            lecture=factory.Iterator(lectures),
-        )
-        homeworks = list(HomeWork.objects.all())
+        self.batch_size, self.copy, self.history = options["batch_size"], options["copy"], not options["no_history"]
+        scale = options["scale"]
+        num_students, num_teachers = scaled(NUM_STUDENTS, scale), scaled(NUM_TEACHERS, scale)
+        num_courses, num_lectures = scaled(NUM_COURSES, scale), scaled(NUM_LECTURES, scale)
+        num_homeworks, num_submissions = scaled(NUM_HOMEWORKS, scale), scaled(NUM_SUBMISSIONS, scale)
+        num_grades, num_comments = min(scaled(NUM_GRADES, scale), num_submissions), scaled(NUM_COMMENTS, scale)
+        fake = Faker()
+        self.pools = {
+            "first_name": [fake.first_name() for _ in range(POOL_SIZE)],
+            "last_name": [fake.last_name() for _ in range(POOL_SIZE)],
+            "title": [fake.sentence(nb_words=4) for _ in range(POOL_SIZE)],
+            "topic": [fake.sentence(nb_words=3) for _ in range(POOL_SIZE)],
+            "datetime": [fake.date_time_this_year(tzinfo=UTC) for _ in range(POOL_SIZE)],
+            "homework": [fake.paragraph(nb_sentences=5) for _ in range(POOL_SIZE)],
+            "submission": [fake.paragraph(nb_sentences=3) for _ in range(POOL_SIZE)],
+            "comment": [fake.sentence(nb_words=10) for _ in range(POOL_SIZE)],
+        }
 
-        self.stdout.write(f"Crerating {NUM_SUBMISSIONS} submissions...")
-        submissions = SubmissionFactory.create_batch(
-            NUM_SUBMISSIONS,
-            homework=factory.Iterator(homeworks),
-            author=factory.Iterator(students),
-        )
+        with transaction.atomic():
+            self.stdout.write("Deleting old data...")
+            self.delete_old_data()
+            self.stdout.write(self.style.SUCCESS("Old data has been successfully deleted."))
+
+            self.stdout.write("Creating new data...")
+            self.stdout.write(f"Creating {num_students} students and {num_teachers} teachers...")
+            password = make_password(PASSWORD)
+            students = self.insert(User, self.build_users(num_students, "STUDENT", password))
+            teachers = self.insert(User, self.build_users(num_teachers, "TEACHER", password))
+
+            self.stdout.write(f"Creating {num_courses} courses...")
+            courses = self.insert(
+                Course,
+                (Course(title=self.pick("title"), author_id=teachers[i % num_teachers]) for i in range(num_courses)),
+            )
+            course_teachers = [
+                random.sample(teachers, k=min(num_teachers, TEACHERS_PER_COURSE)) for _ in range(num_courses)
+            ]
+            self.insert_members(Course.teachers, courses, course_teachers)
+            self.insert_members(
+                Course.students,
+                courses,
+                (random.sample(students, k=min(num_students, STUDENTS_PER_COURSE)) for _ in range(num_courses)),
+            )
+
+            self.stdout.write(f"Creating {num_lectures} lectures...")
+            lecture_courses = random.choices(range(num_courses), k=num_lectures)  # NOQA: S311
+            lecture_teachers = [random.choice(course_teachers[course]) for course in lecture_courses]  # NOQA: S311
+            lectures = self.insert(
+                Lecture,
+                (
+                    Lecture(
+                        course_id=courses[course],
+                        teacher_id=teacher,
+                        topic=self.pick("topic"),
+                        datetime=self.pick("datetime"),
+                    )
+                    for course, teacher in zip(lecture_courses, lecture_teachers, strict=True)
+                ),
+            )
+
+            # Homeworks go to lectures round robin and submissions to homeworks in runs of
+            # SUBMISSIONS_PER_HOMEWORK, counters are known beforehand.
+            submission_homeworks = [i // SUBMISSIONS_PER_HOMEWORK % num_homeworks for i in range(num_submissions)]
+            submission_counts = Counter(submission_homeworks)
+            graded = random.sample(range(num_submissions), k=num_grades)
+            graded_counts = Counter(submission_homeworks[submission] for submission in graded)
+            self.stdout.write(f"Creating {num_homeworks} homeworks...")
+            homeworks = self.insert(
+                HomeWork,
+                (
+                    HomeWork(
+                        lecture_id=lectures[i % num_lectures],
+                        author_id=lecture_teachers[i % num_lectures],
+                        text=self.pick("homework"),
+                        submission_count=submission_counts[i],
+                        graded_count=graded_counts[i],
+                    )
+                    for i in range(num_homeworks)
+                ),
+            )
+
+            self.stdout.write(f"Creating {num_submissions} submissions...")
+            submissions = self.insert(
+                Submission,
+                (
+                    Submission(
+                        homework_id=homeworks[submission_homeworks[i]],
+                        author_id=students[i % num_students],
+                        text=self.pick("submission"),
+                    )
+                    for i in range(num_submissions)
+                ),
+            )
 
-        self.stdout.write(f"Creating {NUM_GRADES} grades...")
-        submissions_to_grade = random.sample(submissions, k=min(NUM_GRADES, len(submissions)))
-        grades = []
-        for sub in submissions_to_grade:
-            course_teachers = list(sub.homework.lecture.course.teachers.all())
-            if not course_teachers:
-                course_teachers = teachers
-            grader = random.choice(course_teachers)  # NOQA: S311
-            grades.append(GradeFactory(submission=sub, author=grader))
-
-        self.stdout.write(f"Creating {NUM_COMMENTS} comments...")
-        if grades:
-            CommentFactory.create_batch(
-                NUM_COMMENTS,
-                grade=factory.Iterator(grades),
-                author=factory.Iterator(all_users),
+            self.stdout.write(f"Creating {num_grades} grades...")
+            grades = self.insert(
+                Grade,
+                (
+                    Grade(
+                        submission_id=submissions[i],
+                        author_id=random.choice(  # NOQA: S311
+                            course_teachers[lecture_courses[submission_homeworks[i] % num_lectures]]
+                        ),
+                        score=random.randint(1, 100),  # NOQA: S311
+                    )
+                    for i in graded
+                ),
             )
 
+            self.stdout.write(f"Creating {num_comments} comments...")
+            all_users = students + teachers
+            self.insert(
+                Comment,
+                (
+                    Comment(
+                        grade_id=grades[i % num_grades],
+                        author_id=all_users[i % len(all_users)],
+                        text=self.pick("comment"),
+                    )
+                    for i in range(num_comments)
+                ),
+            )
+
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), [User, *COURSE_MODELS]):
+                    cursor.execute(sql)
+
+        # Objects are inserted without signals, so cached versions of courses are outdated.
+        cache.clear()
         self.stdout.write(self.style.SUCCESS("The database has been successfully filled!"))
+
+    def pick(self, pool: str):
+        return random.choice(self.pools[pool])  # NOQA: S311
+
+    def delete_old_data(self):
+        """Truncates course tables with their history, users are deleted in batches without history."""
+        tables = [model._meta.db_table for model in COURSE_MODELS]
+        tables += [model.history.model._meta.db_table for model in COURSE_MODELS]
+        tables += [Course.teachers.through._meta.db_table, Course.students.through._meta.db_table]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sql_flush(no_style(), tables, reset_sequences=True):
+                cursor.execute(sql)
+        user_ids = User.objects.filter(is_superuser=False, is_staff=False).values_list("pk", flat=True)
+        with override_settings(HISTORY_RECORDING="off"):
+            for batch in batched(user_ids.iterator(chunk_size=self.batch_size), self.batch_size):
+                User.objects.filter(pk__in=batch).delete()
+
+    def build_users(self, count: int, role: str, password: str) -> Iterator[User]:
+        """Users with the same password hash, hashing it per user takes most of the time."""
+        first_id = next_pk(User)
+        for pk in range(first_id, first_id + count):
+            yield User(
+                pk=pk,
+                username=f"user_{pk}",
+                email=f"user_{pk}@example.com",
+                role=role,
+                password=password,
+                first_name=self.pick("first_name"),
+                last_name=self.pick("last_name"),
+            )
+
+    def insert(self, model: type[Model], objs: Iterable[Model]) -> list[int]:
+        """Assigns primary keys following the largest one, inserts objects in batches and returns their keys."""
+        next_id = next_pk(model)
+        pks = []
+        for batch in batched(objs, self.batch_size):
+            for obj in batch:
+                if obj.pk is None:
+                    obj.pk = next_id
+                    next_id += 1
+                pks.append(obj.pk)
+            self.write(model, batch)
+            if self.history and hasattr(model, "history"):
+                self.write(model.history.model, build_history(model, batch))
+        return pks
+
+    def insert_members(self, descriptor, courses: list[int], members: Iterable[list[int]]):
+        """Inserts rows of a many to many through table of courses and users."""
+        through = descriptor.through
+        course_field, user_field = descriptor.field.m2m_column_name(), descriptor.field.m2m_reverse_name()
+        rows = (
+            through(**{course_field: course, user_field: user})
+            for course, users in zip(courses, members, strict=True)
+            for user in users
+        )
+        for batch in batched(rows, self.batch_size):
+            self.write(through, batch)
+
+    def write(self, model: type[Model], objs: tuple[Model, ...]):
+        if self.copy:
+            copy_rows(model, objs)
+        else:
+            model._default_manager.bulk_create(objs)
+
+
+def scaled(number: int, scale: float) -> int:
+    return max(1, round(number * scale))
+
+
+def next_pk(model: type[Model]) -> int:
+    return (model._default_manager.aggregate(max_id=Max("pk"))["max_id"] or 0) + 1
+
+
+def build_history(model: type[Model], objs: Iterable[Model]) -> list[Model]:
+    """Creation rows of the objects, like `bulk_history_create` of simple_history builds them."""
+    history_model, history_date = model.history.model, timezone.now()
+    return [
+        history_model(
+            history_date=history_date,
+            history_type="+",
+            history_change_reason="",
+            **{field.attname: getattr(obj, field.attname) for field in history_model.tracked_fields},
+        )
+        for obj in objs
+    ]
+
+
+def copy_rows(model: type[Model], objs: tuple[Model, ...]):
+    """Loads objects by COPY in the CSV format, empty primary keys are left to the database."""
+    fields = [
+        field
+        for field in model._meta.concrete_fields
+        if not (field.primary_key and getattr(objs[0], field.attname) is None)
+    ]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for obj in objs:
+        values = (field.get_db_prep_save(field.pre_save(obj, True), connection) for field in fields)
+        writer.writerow([COPY_NULL if value is None else value for value in values])
+    buffer.seek(0)
+    quote = connection.ops.quote_name
+    columns = ", ".join(quote(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        cursor.cursor.copy_expert(
+            f"COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')", buffer
+        )
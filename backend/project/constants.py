@@ -10,6 +10,7 @@ class EventEnum(StrEnum):
     CREATE = "create"
     UPDATE = "update"
     DELETE = "delete"
+    BULK_CREATE = "bulk_create"
 
 
 if __name__ == "__main__":
@@ -1,18 +1,102 @@
+import asyncio
 import json
+import logging
+import os
+import threading
 import uuid
 from dataclasses import dataclass, field
+from functools import cached_property
 
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Model
-from rest_framework.renderers import JSONRenderer
 from rest_framework.serializers import Serializer
+from rest_framework.utils.encoders import JSONEncoder
 
 from project.constants import ChannelGroup, EventEnum
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
 channel_layer = get_channel_layer()
 
 
+def dumps(data) -> str:
+    """Encodes data to JSON with orjson if it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data, default=JSONEncoder().default).decode()
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":"))
+
+
+async def group_send_many(messages: list[tuple[str, dict]]):
+    """Sends (group, message) pairs to the channel layer concurrently."""
+    results = await asyncio.gather(
+        *(channel_layer.group_send(group, message) for group, message in messages),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error("Failed to send notification", exc_info=result)
+
+
+class NotificationDispatcher:
+    """
+    Sends notifications off the request path.
+
+    Messages are coalesced by key within `window` seconds and sent in one batch
+    from a background event loop, or handed over to Celery as one task.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._pending: dict[tuple, list[tuple[str, dict]]] = {}
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._pid: int | None = None
+        self._flush_scheduled = False
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None or self._pid != os.getpid():
+            self._loop = asyncio.new_event_loop()
+            self._pid = os.getpid()
+            self._flush_scheduled = False
+            thread = threading.Thread(target=self._loop.run_forever, name="notification-dispatcher", daemon=True)
+            thread.start()
+        return self._loop
+
+    def enqueue(self, key: tuple, messages: list[tuple[str, dict]]):
+        with self._lock:
+            loop = self._get_loop()
+            self._pending[key] = messages
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        loop.call_soon_threadsafe(loop.call_later, self.window, self._flush)
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flush_scheduled = False
+        batch = [message for messages in pending.values() for message in messages]
+        if not batch:
+            return
+        if settings.NOTIFICATION_DISPATCH == "celery":
+            from core.tasks import send_notifications
+
+            send_notifications.delay(batch)
+        else:
+            self._loop.create_task(group_send_many(batch))
+
+
+dispatcher = NotificationDispatcher(window=settings.NOTIFICATION_COALESCE_WINDOW)
+
+
 @dataclass
 class Notification:
 
@@ -39,24 +123,64 @@ class NotificationSender:
     serializer_class: type[Serializer] | None = None
 
     @property
+    def model(self) -> type[Model]:
+        return type(self.instance)
+
+    @cached_property
     def serializer(self):
-        if self.serializer_class:
-            return self.serializer_class(self.instance)
-        return self.serializers_map[type(self.instance)](self.instance)
+        serializer_class = self.serializer_class or self.serializers_map[self.model]
+        return serializer_class(self.instance)
 
-    def to_dict(self):
-        json_string = JSONRenderer().render(self.serializer.data).decode('utf-8')
-        return json.loads(json_string)
+    @property
+    def object_name(self) -> str:
+        return self.serializer.Meta.api_object_name
+
+    def encode(self) -> str:
+        """Returns the notification as a JSON string, serializing the instance only once."""
+        notification = Notification(event=self.event, object_name=self.object_name, obj=self.serializer.data)
+        return dumps(notification.to_dict())
+
+    def get_groups(self) -> list[str]:
+        return [self.group]
+
+    def get_messages(self) -> list[tuple[str, dict]]:
+        message = {'type': 'get.message', 'message': self.encode()}
+        return [(group, message) for group in self.get_groups()]
 
     def send(self):
-        obj = self.to_dict()
-        notification = Notification(
-            event=self.event, object_name=self.serializer.Meta.api_object_name, obj=obj
-        )
-        json_string = json.dumps(notification.to_dict())
-        async_to_sync(channel_layer.group_send)(
-            self.group, {
-                'type': 'get.message',
-                'message': json_string,
-            }
-        )
+        """Sends notification inline or after commit, see `NOTIFICATION_DISPATCH` setting."""
+        if settings.NOTIFICATION_DISPATCH == "inline":
+            async_to_sync(group_send_many)(self.get_messages())
+        else:
+            transaction.on_commit(self.enqueue, robust=True)
+
+    def get_key(self) -> tuple:
+        """Notifications with the same key are coalesced by the dispatcher."""
+        return (self.model._meta.label, self.instance.pk, self.event)
+
+    def enqueue(self):
+        dispatcher.enqueue(self.get_key(), self.get_messages())
+
+
+@dataclass
+class BulkNotificationSender(NotificationSender):
+    """Sends objects of one model created together as a single notification with a list in `obj`."""
+
+    instance: list[Model]
+    event: EventEnum = EventEnum.BULK_CREATE
+
+    @property
+    def model(self) -> type[Model]:
+        return type(self.instance[0])
+
+    @cached_property
+    def serializer(self):
+        serializer_class = self.serializer_class or self.serializers_map[self.model]
+        return serializer_class(self.instance, many=True)
+
+    @property
+    def object_name(self) -> str:
+        return self.serializer.child.Meta.api_object_name
+
+    def get_key(self) -> tuple:
+        return (self.model._meta.label, tuple(obj.pk for obj in self.instance), self.event)
@@ -2,6 +2,7 @@ from datetime import timedelta
 from pathlib import Path
 
 import environ
+from celery.schedules import crontab
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -38,6 +39,7 @@ INSTALLED_APPS = [
     "users",
     "courses",
     "mock",
+    "benchmarks",
 ]
 
 MIDDLEWARE = [
@@ -74,6 +76,14 @@ TEMPLATES = [
 REDIS_HOST = ENV.str("REDIS_HOST", default="localhost")
 REDIS_PORT = ENV.str("REDIS_PORT", default="6379")
 REDIS_DB = ENV.str("REDIS_DB", default="0")
+REDIS_CACHE_DB = ENV.str("REDIS_CACHE_DB", default="1")
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_CACHE_DB}",
+    },
+}
 
 WSGI_APPLICATION = "project.wsgi.application"
 ASGI_APPLICATION = "project.asgi.application"
@@ -85,6 +95,27 @@ CHANNEL_LAYERS = {
         },
     },
 }
+# "inline" sends inside the request, "thread" and "celery" send after commit
+NOTIFICATION_DISPATCH = ENV.str("NOTIFICATION_DISPATCH", default="thread")
+NOTIFICATION_COALESCE_WINDOW = ENV.float("NOTIFICATION_COALESCE_WINDOW", default=0.05)
+# Websocket authentication, TTL is capped by the token expiry
+WEBSOCKET_USER_CACHE_TTL = ENV.int("WEBSOCKET_USER_CACHE_TTL", default=60)
+WEBSOCKET_USER_CACHE_SIZE = ENV.int("WEBSOCKET_USER_CACHE_SIZE", default=10000)
+WEBSOCKET_AUTH_FROM_CLAIMS = ENV.bool("WEBSOCKET_AUTH_FROM_CLAIMS", default=False)
+# In-process cache of course and lecture responses, invalidated by version counters
+RESPONSE_CACHE_TTL = ENV.int("RESPONSE_CACHE_TTL", default=300)
+RESPONSE_CACHE_SIZE = ENV.int("RESPONSE_CACHE_SIZE", default=1000)
+# History recording: off, inline, batched (on commit) or celery,
+# only inline sends post_create_historical_record
+HISTORY_RECORDING = ENV.str("HISTORY_RECORDING", default="inline")
+# History retention: versions older than HISTORY_KEEP_DAYS are deleted beyond the last HISTORY_KEEP_VERSIONS
+HISTORY_KEEP_VERSIONS = ENV.int("HISTORY_KEEP_VERSIONS", default=10)
+HISTORY_KEEP_DAYS = ENV.int("HISTORY_KEEP_DAYS", default=180)
+HISTORY_COMPACT_BATCH_SIZE = ENV.int("HISTORY_COMPACT_BATCH_SIZE", default=5000)
+HISTORY_ARCHIVE = ENV.bool("HISTORY_ARCHIVE", default=False)
+# Query budgets of views: raise when exceeded (tests) or log violations of a sample of requests
+QUERY_BUDGET_RAISE = ENV.bool("QUERY_BUDGET_RAISE", default=False)
+QUERY_BUDGET_SAMPLE_RATE = ENV.float("QUERY_BUDGET_SAMPLE_RATE", default=0.01)
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
@@ -162,6 +193,8 @@ REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 100,
 }
+# Max number of objects in one request to the `bulk/` endpoints
+BULK_CREATE_MAX_SIZE = ENV.int("BULK_CREATE_MAX_SIZE", default=1000)
 # Spectacular settings
 # https://drf-spectacular.readthedocs.io/en/latest/settings.html
 
@@ -241,6 +274,9 @@ CELERY_TASK_ROUTES = {
     "project.celery.low_task": {"queue": "low"},
     "project.celery.high_task": {"queue": "high"},
 }
+CELERY_BEAT_SCHEDULE = {
+    "compact-history": {"task": "core.tasks.compact_all_history", "schedule": crontab(hour=3, minute=30)},
+}
 
 # S3 integration
 STORAGES = {
@@ -2,10 +2,13 @@ import shutil
 import tempfile
 
 import pytest
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import override_settings
 from rest_framework.test import APIClient
 
+from core.views import response_cache
+
 try:
     from courses.models import Course
 except (NameError, ImportError) as e:
@@ -42,6 +45,19 @@ PASSWORD = "pass"
 TEMP_MEDIA_ROOT = tempfile.mkdtemp()
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Cached course membership and responses must not leak between tests."""
+    cache.clear()
+    response_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def enforce_query_budget(settings):
+    """Requests over `query_budget` of their view fail the test."""
+    settings.QUERY_BUDGET_RAISE = True
+
+
 @pytest.fixture
 def teacher(db, django_user_model):
     """Fixture `User` TEACHER."""
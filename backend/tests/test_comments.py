@@ -87,3 +87,14 @@ def test_delete_comment_by_non_author(auth_client, comment):
     response = auth_client.delete(url)
     assert response.status_code == status.HTTP_403_FORBIDDEN
     comment.refresh_from_db()
+
+
+@pytest.mark.parametrize('auth_client', ['student'], indirect=True)
+def test_comments_query_count(auth_client, comment, django_assert_num_queries):
+    url = f'/api/v1/submissions/grade/{comment.grade.pk}/comments/'
+    with django_assert_num_queries(3):
+        response = auth_client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    with django_assert_num_queries(3):
+        response = auth_client.post(url, {'text': 'test_text'})
+    assert response.status_code == status.HTTP_201_CREATED
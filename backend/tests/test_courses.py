@@ -1,6 +1,15 @@
+import csv
+import json
+
 import pytest
 from django.core.exceptions import ObjectDoesNotExist
 
+from api.v1.views import CourseViewSet
+from core.queries import QueryBudgetError
+from core.views import response_cache
+from courses.membership import get_cached_course_membership, get_course_membership, get_user_courses
+from courses.models import Course
+
 
 @pytest.mark.parametrize("auth_client", ["teacher"], indirect=True)
 def test_course_creation(teacher, student, auth_client):
@@ -34,6 +43,24 @@ def test_course_update(teacher, student, course, auth_client):
     assert isinstance(data["id"], int) is True
 
 
+@pytest.mark.parametrize("loaded", [True, False])
+def test_author_change_invalidates_uncached_membership(course, teacher, another_teacher, loaded, monkeypatch):
+    notified = []
+    monkeypatch.setattr("courses.signals.notify_courses_changed", notified.extend)
+    assert get_user_courses(teacher.id).staff_course_ids == {course.id}
+    assert get_user_courses(another_teacher.id).staff_course_ids == set()
+    # Only the user courses are cached, the membership of the course isn't.
+    assert get_cached_course_membership(course.id) is None
+    courses = Course.objects.all() if loaded else Course.objects.defer("author")
+    course = courses.get(pk=course.pk)
+    course.author = another_teacher
+    course.save()
+    assert get_user_courses(teacher.id).staff_course_ids == set()
+    assert get_user_courses(another_teacher.id).staff_course_ids == {course.id}
+    assert get_course_membership(course.id).author_id == another_teacher.id
+    assert sorted(notified) == sorted([teacher.id, another_teacher.id])
+
+
 @pytest.mark.parametrize("auth_client", ["student"], indirect=True)
 def test_student_cant_update_couse(teacher, student, course, auth_client):
     url = f"/api/v1/courses/{course.id}/"
@@ -67,3 +94,224 @@ def test_not_author_cant_change_course(teacher, student, someone_else_course, au
     assert response.status_code == 403
     response = auth_client.delete(url)
     assert response.status_code == 403
+
+
+@pytest.mark.parametrize("auth_client", ["teacher"], indirect=True)
+def test_course_notification_is_sent_after_commit(auth_client, monkeypatch, django_capture_on_commit_callbacks):
+    from project.notifications import dispatcher
+
+    sent = []
+    monkeypatch.setattr(dispatcher, "enqueue", lambda key, messages: sent.append(key))
+    with django_capture_on_commit_callbacks(execute=False) as callbacks:
+        response = auth_client.post("/api/v1/courses/", data={"title": "string"}, format="json")
+    assert response.status_code == 201
+    assert sent == []
+    for callback in callbacks:
+        callback()
+    assert ("courses.Course", response.json()["id"], "create") in sent
+
+
+@pytest.mark.parametrize("auth_client", ["teacher"], indirect=True)
+def test_gradebook_csv(auth_client, course, homework, grade, another_submission, student):
+    response = auth_client.get(f"/api/v1/courses/{course.id}/gradebook.csv")
+    assert response.status_code == 200
+    assert response["Content-Type"] == "text/csv"
+    lines = b"".join(response.streaming_content).decode().splitlines()
+    assert lines[0] == "lecture_id,homework_id,submission_id,student_id,student,submitted_at,score,graded_by,graded_at"
+    assert len(lines) == 3
+    assert lines[1].startswith(f"{homework.lecture_id},{homework.id},{grade.submission_id},{student.id},student,")
+    assert lines[2].endswith(",,,")
+
+
+@pytest.mark.parametrize("username", ["=1+2", "+student", "-student", "@student"])
+@pytest.mark.parametrize("auth_client", ["teacher"], indirect=True)
+def test_gradebook_csv_escapes_formulas(auth_client, course, submission, student, username):
+    student.username = username
+    student.save()
+    response = auth_client.get(f"/api/v1/courses/{course.id}/gradebook.csv")
+    row = next(csv.reader(b"".join(response.streaming_content).decode().splitlines()[1:]))
+    assert row[4] == f"'{username}"
+
+
+@pytest.mark.parametrize("auth_client", ["teacher"], indirect=True)
+def test_gradebook_ndjson(auth_client, course, grade, another_submission):
+    response = auth_client.get(f"/api/v1/courses/{course.id}/gradebook.ndjson")
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+    assert [(row["submission_id"], row["score"]) for row in rows] == [
+        (grade.submission_id, grade.score),
+        (another_submission.id, None),
+    ]
+
+
+@pytest.mark.parametrize("auth_client", ["teacher"], indirect=True)
+def test_gradebook_stream_counts_queries(auth_client, course, grade, monkeypatch):
+    monkeypatch.setitem(CourseViewSet.query_budget, "gradebook", 1)
+    response = auth_client.get(f"/api/v1/courses/{course.id}/gradebook.csv")
+    assert response.status_code == 200
+    with pytest.raises(QueryBudgetError, match=r"made 2 queries, CourseViewSet\.gradebook budget is 1"):
+        b"".join(response.streaming_content)
+
+
+@pytest.mark.parametrize("auth_client", ["student", "another_teacher"], indirect=True)
+def test_gradebook_forbidden(auth_client, course, student):
+    course.students.add(student)
+    response = auth_client.get(f"/api/v1/courses/{course.id}/gradebook.csv")
+    assert response.status_code == 403
+    response = auth_client.get(f"/api/v1/courses/{course.id + 1}/gradebook.csv")
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("auth_client", ["teacher"], indirect=True)
+def test_course_stats(
+    auth_client,
+    course,
+    homework,
+    student,
+    another_student,
+    grade,
+    another_submission,
+    django_assert_num_queries,
+    django_capture_on_commit_callbacks,
+):
+    course.students.add(student, another_student)
+    url = f"/api/v1/courses/{course.id}/stats/"
+    with django_assert_num_queries(4):
+        response = auth_client.get(url)
+    assert response.status_code == 200
+    stats = response.json()
+    assert (stats["student_count"], stats["homework_count"]) == (2, 1)
+    [homework_stats] = stats["homeworks"]
+    assert homework_stats["homework_id"] == homework.id
+    assert (homework_stats["submission_count"], homework_stats["graded_count"]) == (2, 1)
+    assert homework_stats["submission_rate"] == 1
+    assert homework_stats["scores"]["mean"] == homework_stats["scores"]["median"] == 1
+    assert homework_stats["scores"]["histogram"][0] == {"min": 0, "max": 10, "count": 1}
+    assert [(item["student_id"], item["graded_count"]) for item in stats["students"]] == [
+        (student.id, 1),
+        (another_student.id, 0),
+    ]
+    with django_assert_num_queries(0):
+        assert auth_client.get(url).json() == stats
+
+    with django_capture_on_commit_callbacks(execute=True):
+        grade.score = 55
+        grade.save()
+    scores = auth_client.get(url).json()["scores"]
+    assert scores["mean"] == 55
+    assert scores["histogram"][5]["count"] == 1
+
+
+@pytest.mark.parametrize("auth_client", ["student", "another_teacher"], indirect=True)
+def test_course_stats_forbidden(auth_client, course, student):
+    course.students.add(student)
+    assert auth_client.get(f"/api/v1/courses/{course.id}/stats/").status_code == 403
+
+
+@pytest.mark.parametrize("auth_client", ["student"], indirect=True)
+def test_course_list_is_compact(auth_client, course, teacher, student, another_student, django_assert_num_queries):
+    course.students.add(student, another_student)
+    course.teachers.add(teacher)
+    with django_assert_num_queries(3):
+        response = auth_client.get("/api/v1/courses/")
+    assert response.status_code == 200
+    item = response.json()["results"][0]
+    detail = auth_client.get(f"/api/v1/courses/{course.id}/").json()
+    assert item == {
+        "id": course.id,
+        "title": course.title,
+        "author": teacher.id,
+        "teacher_count": 1,
+        "student_count": 2,
+        "created_at": detail["created_at"],
+        "updated_at": detail["updated_at"],
+    }
+    response = auth_client.get("/api/v1/courses/", {"expand": "students,unknown"})
+    item = response.json()["results"][0]
+    assert sorted(item["students"]) == sorted([student.id, another_student.id])
+    assert "teachers" not in item
+
+
+@pytest.mark.parametrize("auth_client", ["student"], indirect=True)
+def test_course_sparse_fields(auth_client, course, teacher, student, django_assert_num_queries):
+    course.students.add(student)
+    with django_assert_num_queries(3):
+        response = auth_client.get(f"/api/v1/courses/{course.id}/")
+    assert response.json()["students"] == [student.id]
+    with django_assert_num_queries(1):
+        response = auth_client.get(f"/api/v1/courses/{course.id}/", {"omit": "teachers,students"})
+    assert response.json().keys() == {"id", "title", "author", "created_at", "updated_at"}
+
+    with django_assert_num_queries(3) as captured:
+        response = auth_client.get("/api/v1/courses/", {"fields": "id,title,students", "expand": "students"})
+    assert response.json()["results"] == [{"id": course.id, "title": course.title, "students": [student.id]}]
+    assert "cardinality" not in captured[2]["sql"]
+
+
+@pytest.mark.parametrize("auth_client", ["student"], indirect=True)
+def test_course_conditional_get(auth_client, course, django_assert_num_queries):
+    response = auth_client.get("/api/v1/courses/")
+    etag = response["ETag"]
+    with django_assert_num_queries(0):
+        response = auth_client.get("/api/v1/courses/", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response["X-Cache"] == "HIT"
+    assert "Last-Modified" not in response
+    assert auth_client.get("/api/v1/courses/", {"fields": "id"}, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    response = auth_client.get(f"/api/v1/courses/{course.id}/")
+    last_modified = response["Last-Modified"]
+    response = auth_client.get(f"/api/v1/courses/{course.id}/", HTTP_IF_MODIFIED_SINCE=last_modified)
+    assert response.status_code == 304
+
+    course.title = "New title"
+    course.save()
+    assert auth_client.get("/api/v1/courses/", HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+@pytest.mark.parametrize("auth_client", ["teacher"], indirect=True)
+def test_course_etag_follows_members(auth_client, course, student, django_assert_num_queries):
+    urls = ["/api/v1/courses/", f"/api/v1/courses/{course.id}/"]
+    etags = [auth_client.get(url)["ETag"] for url in urls]
+    response_cache.clear()
+    # Members are prefetched only for a response with a body.
+    with django_assert_num_queries(1):
+        response = auth_client.get(urls[1], HTTP_IF_NONE_MATCH=etags[1])
+    assert response.status_code == 304
+
+    course.students.add(student)
+    for url, etag in zip(urls, etags, strict=True):
+        response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+    assert response.data["students"] == [student.id]
+
+
+@pytest.mark.parametrize("auth_client", ["student"], indirect=True)
+def test_course_responses_are_cached(auth_client, course, student, django_assert_num_queries):
+    response = auth_client.get("/api/v1/courses/")
+    assert response["X-Cache"] == "MISS"
+    with django_assert_num_queries(0):
+        cached = auth_client.get("/api/v1/courses/")
+    assert cached["X-Cache"] == "HIT"
+    assert cached.json() == response.json()
+    assert auth_client.get("/api/v1/courses/", {"expand": "students"})["X-Cache"] == "MISS"
+
+    auth_client.get(f"/api/v1/courses/{course.id}/")
+    course.students.add(student)
+    response = auth_client.get("/api/v1/courses/")
+    assert response["X-Cache"] == "MISS"
+    assert response.json()["results"][0]["student_count"] == 1
+    response = auth_client.get(f"/api/v1/courses/{course.id}/")
+    assert response["X-Cache"] == "MISS"
+    assert response.json()["students"] == [student.id]
+
+
+@pytest.mark.parametrize("auth_client", ["student"], indirect=True)
+def test_course_responses_without_version_keys_are_not_cached(auth_client, monkeypatch, course):
+    monkeypatch.setattr(CourseViewSet, "get_cache_version_keys", lambda self: [])
+    for _ in range(2):
+        response = auth_client.get("/api/v1/courses/")
+        assert response.status_code == 200
+        assert "X-Cache" not in response
+    assert response_cache.misses == 0
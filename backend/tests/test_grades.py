@@ -1,6 +1,19 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+
 import pytest
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.utils import timezone
+from kombu.serialization import dumps, loads
 from rest_framework import status
 
+from core.history import archive_history, history_buffer
+from core.tasks import write_history_rows
+from courses.models import Grade
+from courses.services import GradingService
+
 PAYLOAD = {"score": 222}
 
 
@@ -35,3 +48,180 @@ def test_update_grade_submission_by_student_forbidden(auth_client, grade):
     url = f'/api/v1/submissions/{grade.submission_id}/grade/'
     response = auth_client.patch(url, PAYLOAD)
     assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.parametrize('auth_client', ['teacher',], indirect=True)
+def test_grade_query_count(auth_client, submission, django_assert_num_queries):
+    url = f'/api/v1/submissions/{submission.id}/grade/'
+    with django_assert_num_queries(7):
+        response = auth_client.post(url, PAYLOAD)
+    assert response.status_code == status.HTTP_201_CREATED
+    with django_assert_num_queries(3):
+        response = auth_client.patch(url, PAYLOAD)
+    assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.parametrize('auth_client', ['teacher',], indirect=True)
+def test_bulk_grade_homework(auth_client, homework, grade, another_submission, django_assert_num_queries):
+    url = f'/api/v1/homeworks/{homework.id}/grades/'
+    payload = [
+        {'submission_id': grade.submission_id, 'score': 5},
+        {'submission_id': another_submission.id, 'score': 4},
+    ]
+    with django_assert_num_queries(9) as captured:
+        response = auth_client.post(url, payload, format='json')
+    assert any(query['sql'].endswith('FOR NO KEY UPDATE') for query in captured.captured_queries)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == {'created': [another_submission.id], 'updated': [grade.submission_id], 'conflicts': []}
+    grade.refresh_from_db()
+    assert grade.score == 5
+    assert another_submission.grade.score == 4
+    assert list(grade.history.values_list('history_type', 'score')) == [('~', 5), ('+', 1)]
+    assert another_submission.grade.history.get().history_type == '+'
+
+
+def test_bulk_grade_waits_for_concurrent_grade(transactional_db, homework, submission, teacher, another_teacher):
+    result = {}
+
+    def bulk_upsert():
+        try:
+            result.update(GradingService(teacher).bulk_upsert(homework, [{'submission_id': submission.id, 'score': 5}]))
+        finally:
+            connection.close()
+
+    with transaction.atomic():
+        GradingService(another_teacher).create(submission=submission, score=1)
+        thread = threading.Thread(target=bulk_upsert)
+        thread.start()
+        # The bulk grading waits for this transaction to classify the submission.
+        thread.join(timeout=0.5)
+        assert thread.is_alive()
+    thread.join()
+    assert result['conflicts'][0]['detail'] == f'Submission {submission.id} is graded by another teacher.'
+    submission.grade.refresh_from_db()
+    assert (submission.grade.author_id, submission.grade.score) == (another_teacher.id, 1)
+
+
+@pytest.mark.parametrize('auth_client', ['teacher',], indirect=True)
+def test_batched_history_is_written_on_commit(
+    auth_client, settings, teacher, submission, another_submission, django_capture_on_commit_callbacks
+):
+    settings.HISTORY_RECORDING = 'batched'
+    url = f'/api/v1/submissions/{submission.id}/grade/'
+    with django_capture_on_commit_callbacks(execute=True):
+        auth_client.post(url, PAYLOAD)
+        auth_client.patch(url, {'score': 5})
+        with transaction.atomic():
+            Grade.objects.create(submission=another_submission, author=teacher, score=3)
+            transaction.set_rollback(True)
+        assert not Grade.history.exists()
+    assert list(submission.grade.history.values_list('history_type', 'score')) == [('~', 5), ('+', PAYLOAD['score'])]
+    assert Grade.history.count() == 2
+
+
+def test_batched_history_drops_rolled_back_savepoints(
+    settings, teacher, submission, another_submission, django_capture_on_commit_callbacks
+):
+    settings.HISTORY_RECORDING = 'batched'
+    with django_capture_on_commit_callbacks(execute=True):
+        with transaction.atomic():
+            Grade.objects.create(submission=submission, author=teacher, score=1)
+            transaction.set_rollback(True)
+        Grade.objects.create(submission=another_submission, author=teacher, score=2)
+        assert [[row.score for row in rows] for _, rows, _ in history_buffer.pending.values()] == [[2]]
+    assert not history_buffer.pending
+    assert list(Grade.history.values_list('score', flat=True)) == [2]
+
+
+@pytest.mark.parametrize('auth_client', ['teacher',], indirect=True)
+def test_celery_history_rows_round_trip(
+    auth_client, settings, monkeypatch, teacher, submission, django_capture_on_commit_callbacks
+):
+    settings.HISTORY_RECORDING = 'celery'
+
+    def delay(*args):
+        # Arguments go through the JSON serializer of the broker before the task runs eagerly.
+        content_type, encoding, payload = dumps(args, 'json')
+        return write_history_rows.apply(loads(payload, content_type, encoding), throw=True)
+
+    monkeypatch.setattr(write_history_rows, 'delay', delay)
+    url = f'/api/v1/submissions/{submission.id}/grade/'
+    with django_capture_on_commit_callbacks(execute=True):
+        auth_client.post(url, PAYLOAD)
+        auth_client.patch(url, {'score': 5})
+    grade = submission.grade
+    rows = list(grade.history.order_by('history_id'))
+    assert [(row.history_type, row.score) for row in rows] == [('+', PAYLOAD['score']), ('~', 5)]
+    assert {row.history_user_id for row in rows} == {teacher.id}
+    assert rows[-1].updated_at == grade.updated_at
+    assert rows[0].history_date < rows[1].history_date
+    assert rows[-1].history_date.tzinfo is not None
+
+
+@pytest.mark.parametrize('archive', [False, True])
+def test_compact_history(grade, another_submission, teacher, archive):
+    for score in (2, 3, 4):
+        grade.score = score
+        grade.save()
+    recent = Grade.objects.create(submission=another_submission, author=teacher, score=1)
+    for score in (2, 3):
+        recent.score = score
+        recent.save()
+    Grade.history.exclude(submission_id=recent.submission_id).update(history_date=timezone.now() - timedelta(days=200))
+    grade.history.filter(score=4).update(history_date=timezone.now())
+    call_command(
+        'compact_history', keep_versions=2, keep_days=30, batch_size=2, archive=archive,
+        models=['courses.HistoricalGrade'], stdout=StringIO(),
+    )
+    assert list(grade.history.values_list('score', flat=True)) == [4, 3]
+    # Versions newer than keep_days survive beyond keep_versions.
+    assert list(recent.history.values_list('score', flat=True)) == [3, 2, 1]
+    if archive:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT score FROM courses_historicalgrade_archive ORDER BY score')
+            assert cursor.fetchall() == [(1,), (2,)]
+
+
+def test_archive_history_follows_model_columns(grade):
+    model = Grade.history.model
+    with connection.cursor() as cursor:
+        # The archive was created before `history_change_reason` was added and `legacy` was dropped.
+        cursor.execute(
+            'CREATE TABLE courses_historicalgrade_archive (LIKE courses_historicalgrade) '
+            'PARTITION BY RANGE (history_date)'
+        )
+        cursor.execute('ALTER TABLE courses_historicalgrade_archive DROP COLUMN history_change_reason')
+        cursor.execute('ALTER TABLE courses_historicalgrade_archive ADD COLUMN legacy integer NOT NULL')
+    grade.history.update(history_change_reason='reason')
+    assert archive_history(model, model.objects.all()) == 1
+    assert not grade.history.exists()
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT score, history_change_reason, legacy FROM courses_historicalgrade_archive')
+        assert cursor.fetchall() == [(grade.score, 'reason', None)]
+
+
+@pytest.mark.parametrize('auth_client', ['another_teacher',], indirect=True)
+def test_bulk_grade_homework_conflicts(auth_client, homework, grade, another_submission, submission):
+    url = f'/api/v1/homeworks/{homework.id}/grades/'
+    payload = [
+        {'submission_id': grade.submission_id, 'score': 5},
+        {'submission_id': another_submission.id, 'score': 4},
+        {'submission_id': another_submission.id, 'score': 3},
+        {'submission_id': 0, 'score': 3},
+    ]
+    response = auth_client.post(url, payload, format='json')
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['created'] == [another_submission.id]
+    assert [(row['index'], row['submission_id']) for row in response.data['conflicts']] == [
+        (0, submission.id), (2, another_submission.id), (3, 0)
+    ]
+    grade.refresh_from_db()
+    assert grade.score == 1
+    assert another_submission.grade.score == 4
+
+
+@pytest.mark.parametrize('auth_client', ['student',], indirect=True)
+def test_bulk_grade_homework_by_student_forbidden(auth_client, homework, submission):
+    url = f'/api/v1/homeworks/{homework.id}/grades/'
+    response = auth_client.post(url, [{'submission_id': submission.id, 'score': 5}], format='json')
+    assert response.status_code == status.HTTP_403_FORBIDDEN
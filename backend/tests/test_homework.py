@@ -1,8 +1,17 @@
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
+from rest_framework.test import APIRequestFactory
 
-from courses.models import HomeWork
+from api.v1.filters import HomeWorkFilter
+from api.v1.pagination import CachedCountPagination, IdCursorPagination
+from api.v1.views import LectureHomeWorkViewSet
+from core.queries import QueryBudgetError
+from courses.models import Grade, HomeWork, Submission
+from courses.services import GradingService, SubmissionService
 
 User = get_user_model()
 
@@ -52,6 +61,26 @@ def test_create_homework_by_student_forbidden(auth_client, lecture):
     assert HomeWork.objects.count() == start_count
 
 
+@pytest.mark.parametrize('auth_client', ['teacher'], indirect=True)
+def test_query_budget(auth_client, homework, monkeypatch, settings, caplog):
+    monkeypatch.setattr(LectureHomeWorkViewSet, 'query_budget', {'list': 1})
+    url = f'/api/v1/lectures/{homework.lecture_id}/homeworks/'
+    with pytest.raises(QueryBudgetError, match=r'LectureHomeWorkViewSet\.list budget is 1'):
+        auth_client.get(url)
+
+    settings.QUERY_BUDGET_RAISE = False
+    settings.QUERY_BUDGET_SAMPLE_RATE = 1
+    response = auth_client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    assert 'Query budget exceeded' in caplog.text
+    assert '1 x SELECT' in caplog.text
+
+    settings.QUERY_BUDGET_SAMPLE_RATE = 0
+    caplog.clear()
+    auth_client.get(url)
+    assert not caplog.text
+
+
 @pytest.mark.parametrize('auth_client', ['teacher', 'student', 'another_teacher'], indirect=True)
 def test_retrieve_homework(auth_client, homework):
     url = f'/api/v1/lectures/{homework.lecture_id}/homeworks/{homework.id}/'
@@ -60,6 +89,17 @@ def test_retrieve_homework(auth_client, homework):
     assert response.data['text'] == homework.text
 
 
+@pytest.mark.parametrize('auth_client', ['teacher'], indirect=True)
+def test_retrieve_homework_sparse_fields(auth_client, homework, django_assert_num_queries):
+    url = f'/api/v1/lectures/{homework.lecture_id}/homeworks/{homework.id}/'
+    with django_assert_num_queries(2):
+        response = auth_client.get(url, {'fields': 'id'})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data == {'id': homework.id}
+    response = auth_client.get(url, {'fields': 'id'}, HTTP_IF_NONE_MATCH=response['ETag'])
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
 @pytest.mark.parametrize('auth_client', ['teacher'], indirect=True)
 def test_update_homework_by_author(auth_client, homework):
     url = f'/api/v1/lectures/{homework.lecture_id}/homeworks/{homework.id}/'
@@ -122,3 +162,208 @@ def test_delete_homework_by_student_forbidden(auth_client, lecture, teacher):
     response = auth_client.delete(url)
     assert response.status_code == status.HTTP_403_FORBIDDEN
     assert HomeWork.objects.filter(id=homework.id).exists()
+
+
+@pytest.mark.parametrize('auth_client', ['teacher'], indirect=True)
+def test_homeworks_query_count(auth_client, homework, django_assert_num_queries):
+    url = f'/api/v1/lectures/{homework.lecture_id}/homeworks/'
+    with django_assert_num_queries(4):
+        response = auth_client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    with django_assert_num_queries(3):
+        response = auth_client.post(url, PAYLOAD)
+    assert response.status_code == status.HTTP_201_CREATED
+
+
+@pytest.mark.parametrize('auth_client', ['student'], indirect=True)
+def test_my_homeworks_follow_enrollment(auth_client, student, homework):
+    url = '/api/v1/my/homeworks/'
+    response = auth_client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['results'] == []
+    student.student_courses.add(homework.lecture.course)
+    response = auth_client.get(url)
+    assert [item['id'] for item in response.data['results']] == [homework.id]
+    homework.lecture.course.students.remove(student)
+    response = auth_client.get(url)
+    assert response.data['results'] == []
+
+
+@pytest.mark.parametrize('auth_client', ['teacher'], indirect=True)
+def test_bulk_create_homeworks(auth_client, lecture, django_assert_num_queries, django_capture_on_commit_callbacks):
+    url = f'/api/v1/lectures/{lecture.id}/homeworks/bulk/'
+    payload = [{'text': f'text {i}'} for i in range(1000)]
+    with django_capture_on_commit_callbacks() as callbacks, django_assert_num_queries(3):
+        response = auth_client.post(url, payload, format='json')
+    assert response.status_code == status.HTTP_201_CREATED
+    assert len(response.data) == 1000
+    assert HomeWork.objects.filter(lecture=lecture, author__role='TEACHER').count() == 1000
+    assert HomeWork.history.filter(history_type='+').count() == 1000
+    # One notification for all homeworks and invalidation of course statistics.
+    assert len(callbacks) == 2
+
+
+@pytest.mark.parametrize('auth_client', ['another_teacher'], indirect=True)
+def test_bulk_create_homeworks_by_other_teacher_forbidden(auth_client, lecture):
+    url = f'/api/v1/lectures/{lecture.id}/homeworks/bulk/'
+    response = auth_client.post(url, [PAYLOAD], format='json')
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert not HomeWork.objects.exists()
+
+
+@pytest.mark.parametrize('auth_client', ['teacher'], indirect=True)
+def test_bulk_create_homeworks_limit(auth_client, lecture, settings):
+    settings.BULK_CREATE_MAX_SIZE = 2
+    url = f'/api/v1/lectures/{lecture.id}/homeworks/bulk/'
+    response = auth_client.post(url, [PAYLOAD] * 3, format='json')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    response = auth_client.post(url, [], format='json')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert not HomeWork.objects.exists()
+
+
+@pytest.mark.parametrize('auth_client', ['student'], indirect=True)
+def test_my_homeworks_filters_use_own_submissions(auth_client, student, homework, another_submission):
+    student.student_courses.add(homework.lecture.course)
+    url = '/api/v1/my/homeworks/'
+    response = auth_client.get(url, {'issubmitted': 'true'})
+    assert response.data['results'] == []
+    response = auth_client.get(url, {'issubmitted': 'false'})
+    assert [item['id'] for item in response.data['results']] == [homework.id]
+    Submission.objects.create(text='text', author=student, homework=homework)
+    response = auth_client.get(url, {'issubmitted': 'true'})
+    assert [item['id'] for item in response.data['results']] == [homework.id]
+    response = auth_client.get(url, {'isgraded': 'true'})
+    assert response.data['results'] == []
+
+
+@pytest.mark.parametrize('user', ['teacher', 'student'])
+@pytest.mark.parametrize('params', [
+    {'isgraded': 'true'},
+    {'isgraded': 'false'},
+    {'issubmitted': 'true'},
+    {'issubmitted': 'false'},
+])
+def test_homework_filters_plan(request, user, params, teacher, lecture, student, another_student):
+    homeworks = HomeWork.objects.bulk_create(HomeWork(text=str(i), lecture=lecture, author=teacher) for i in range(50))
+    submissions = Submission.objects.bulk_create(
+        Submission(text='text', author=author, homework=homework)
+        for homework in homeworks[::2] for author in (student, another_student)
+    )
+    Grade.objects.bulk_create(Grade(submission=submission, score=1, author=teacher) for submission in submissions[::4])
+    http_request = APIRequestFactory().get('/api/v1/my/homeworks/', params)
+    http_request.user = request.getfixturevalue(user)
+    queryset = HomeWorkFilter(params, queryset=HomeWork.objects.all(), request=http_request).qs
+    plan = queryset.explain()
+    # NOT IN (subquery) is planned as a SubPlan which is checked for every homework.
+    assert 'SubPlan' not in plan
+    # DISTINCT sorts or groups homeworks by all of their columns.
+    assert 'courses_homework.created_at' not in plan
+    if user == 'teacher':
+        # Teachers see all submissions, counters of homeworks answer without them.
+        assert 'courses_submission' not in plan
+    elif 'false' in params.values():
+        assert 'Anti Join' in plan
+
+
+@pytest.mark.parametrize('auth_client', ['teacher'], indirect=True)
+def test_my_homeworks_page_counts(auth_client, lecture, teacher, monkeypatch, django_assert_num_queries):
+    monkeypatch.setattr(CachedCountPagination, 'page_size', 2)
+    HomeWork.objects.bulk_create(HomeWork(text=str(i), lecture=lecture, author=teacher) for i in range(3))
+    url = '/api/v1/my/homeworks/'
+    response = auth_client.get(url, {'page': 1})
+    assert response.data['count'] == 3
+    HomeWork.objects.create(text='text', lecture=lecture, author=teacher)
+    # The cached count is served until it expires or a page past it is requested.
+    with django_assert_num_queries(3):
+        response = auth_client.get(url, {'page': 1})
+    assert response.data['count'] == 3
+    response = auth_client.get(url, {'page': 1, 'count': 'estimate'})
+    assert response.data['count'] == 3
+    response = auth_client.get(url, {'page': 1, 'count': 'exact'})
+    assert response.data['count'] == 4
+    with django_assert_num_queries(3):
+        response = auth_client.get(url, {'page': 2, 'count': 'false'})
+    assert 'count' not in response.data
+    assert len(response.data['results']) == 2
+    assert response.data['next'] is None
+    assert response.data['previous'] is not None
+    response = auth_client.get(url, {'page': 1, 'count': 'false'})
+    assert response.data['next'].endswith('page=2')
+    response = auth_client.get(url, {'page': 3, 'count': 'false'})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    # The new last page is past the cached count, so it is counted again.
+    HomeWork.objects.create(text='text', lecture=lecture, author=teacher)
+    response = auth_client.get(url, {'page': 3})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['count'] == 5
+    assert len(response.data['results']) == 1
+    response = auth_client.get(url, {'page': 1})
+    assert response.data['count'] == 5
+    response = auth_client.get(url, {'page': 4})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.parametrize('page_size', [2, 20])
+@pytest.mark.parametrize('auth_client', ['teacher', 'student'], indirect=True)
+def test_my_homeworks_query_count(
+    auth_client, page_size, lecture, teacher, student, another_student, monkeypatch, django_assert_num_queries
+):
+    monkeypatch.setattr(IdCursorPagination, 'page_size', page_size)
+    student.student_courses.add(lecture.course)
+    homeworks = HomeWork.objects.bulk_create(HomeWork(text=str(i), lecture=lecture, author=teacher) for i in range(20))
+    submissions = Submission.objects.bulk_create(
+        Submission(text='text', author=author, homework=homework)
+        for homework in homeworks for author in (student, another_student)
+    )
+    Grade.objects.bulk_create(Grade(submission=submission, score=1, author=teacher) for submission in submissions[::3])
+    url = '/api/v1/my/homeworks/'
+    auth_client.get(url)
+    with django_assert_num_queries(3):
+        response = auth_client.get(url)
+    assert len(response.data['results']) == page_size
+    assert any(submission['grade'] for item in response.data['results'] for submission in item['submissions'])
+
+
+@pytest.mark.parametrize('auth_client', ['teacher'], indirect=True)
+def test_homework_counters(auth_client, teacher, student, another_student, homework):
+    url = f'/api/v1/lectures/{homework.lecture_id}/homeworks/{homework.id}/'
+    submission = SubmissionService(student).create(homework=homework, text='text')
+    SubmissionService(another_student).bulk_create([{'text': 'a'}, {'text': 'b'}], homework=homework)
+    etag = auth_client.get(url)['ETag']
+    GradingService(teacher).create(submission=submission, score=1)
+    response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert (response.data['submission_count'], response.data['graded_count']) == (3, 1)
+    other_ids = list(homework.submissions.exclude(pk=submission.pk).values_list('pk', flat=True))
+    items = [{'submission_id': pk, 'score': 2} for pk in [submission.pk, *other_ids]]
+    GradingService(teacher).bulk_upsert(homework, items)
+    homework.refresh_from_db()
+    assert (homework.submission_count, homework.graded_count) == (3, 3)
+    response = auth_client.get('/api/v1/my/homeworks/', {'isgraded': 'true'})
+    assert [item['id'] for item in response.data['results']] == [homework.id]
+    assert 'submission_count' not in response.data['results'][0]
+
+    SubmissionService(student).delete(submission)
+    homework.refresh_from_db()
+    assert (homework.submission_count, homework.graded_count) == (2, 2)
+    HomeWork.objects.update(submission_count=0, graded_count=5)
+    call_command('repair_homework_counters', stdout=None)
+    homework.refresh_from_db()
+    assert (homework.submission_count, homework.graded_count) == (2, 2)
+
+
+@pytest.mark.parametrize('params', [{}, {'fields': 'id,text'}, {'omit': 'submissions'}])
+@pytest.mark.parametrize('auth_client', ['teacher'], indirect=True)
+def test_homework_lists_dont_join_users(auth_client, homework, submission, comment, params):
+    urls = [
+        '/api/v1/my/homeworks/',
+        f'/api/v1/lectures/{homework.lecture_id}/homeworks/',
+        f'/api/v1/submissions/grade/{comment.grade_id}/comments/',
+    ]
+    for url in urls:
+        with CaptureQueriesContext(connection) as context:
+            response = auth_client.get(url, params)
+        assert response.status_code == status.HTTP_200_OK
+        assert not any('JOIN "users_customuser"' in query['sql'] for query in context.captured_queries), url
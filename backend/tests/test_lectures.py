@@ -82,3 +82,77 @@ def test_delete_lecture_by_student_forbidden(auth_client, course, lecture):
     response = auth_client.delete(url)
     assert response.status_code == 403
     assert Lecture.objects.filter(id=lecture.id).exists()
+
+
+@pytest.mark.parametrize('auth_client', ['teacher',], indirect=True)
+def test_lectures_query_count(auth_client, course, lecture, lecture_payload, django_assert_num_queries):
+    url = f'/api/v1/courses/{course.id}/lectures/'
+    with django_assert_num_queries(4):
+        response = auth_client.get(url)
+    assert response.status_code == 200
+    with django_assert_num_queries(3):
+        response = auth_client.post(url, data=lecture_payload, format='multipart')
+    assert response.status_code == 201
+
+
+@pytest.mark.parametrize('auth_client', ['another_teacher',], indirect=True)
+def test_create_lecture_after_joining_course(auth_client, course, another_teacher, lecture_payload):
+    url = f'/api/v1/courses/{course.id}/lectures/'
+    response = auth_client.post(url, data=lecture_payload, format='multipart')
+    assert response.status_code == 403
+    course.teachers.add(another_teacher)
+    lecture_payload['presentation_file'].seek(0)
+    response = auth_client.post(url, data=lecture_payload, format='multipart')
+    assert response.status_code == 201
+    course.teachers.clear()
+    response = auth_client.post(url, data=lecture_payload, format='multipart')
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize('auth_client', ['teacher'], indirect=True)
+def test_bulk_create_lectures(auth_client, course, teacher, django_assert_num_queries):
+    url = f'/api/v1/courses/{course.id}/lectures/bulk/'
+    payload = [{'topic': f'Lecture {i}', 'teacher': teacher.id} for i in range(50)]
+    with django_assert_num_queries(4):
+        response = auth_client.post(url, data=payload, format='json')
+    assert response.status_code == 201
+    assert [item['topic'] for item in response.json()] == [item['topic'] for item in payload]
+    assert Lecture.objects.filter(course=course).count() == 50
+    assert Lecture.history.filter(course_id=course.id, history_type='+').count() == 50
+
+
+@pytest.mark.parametrize('auth_client', ['teacher'], indirect=True)
+def test_lecture_list_cache_invalidation(auth_client, course, lecture, teacher, django_assert_num_queries):
+    url = f'/api/v1/courses/{course.id}/lectures/'
+    # Page counts are cached apart from responses.
+    params = {'count': 'false'}
+    assert auth_client.get(url, params)['X-Cache'] == 'MISS'
+    with django_assert_num_queries(0):
+        response = auth_client.get(url, params)
+    assert response['X-Cache'] == 'HIT'
+    assert len(response.json()['results']) == 1
+    payload = [{'topic': 'Bulk lecture', 'teacher': teacher.id}]
+    auth_client.post(f'{url}bulk/', data=payload, format='json')
+    response = auth_client.get(url, params)
+    assert response['X-Cache'] == 'MISS'
+    assert len(response.json()['results']) == 2
+    lecture.delete()
+    assert len(auth_client.get(url, params).json()['results']) == 1
+
+
+@pytest.mark.parametrize('auth_client', ['another_teacher', 'student'], indirect=True)
+def test_bulk_create_lectures_forbidden(auth_client, course, teacher):
+    url = f'/api/v1/courses/{course.id}/lectures/bulk/'
+    response = auth_client.post(url, data=[{'topic': 'topic', 'teacher': teacher.id}], format='json')
+    assert response.status_code == 403
+    assert not Lecture.objects.exists()
+
+
+@pytest.mark.parametrize('auth_client', ['teacher'], indirect=True)
+def test_bulk_create_lectures_invalid_item(auth_client, course, teacher, student):
+    url = f'/api/v1/courses/{course.id}/lectures/bulk/'
+    payload = [{'topic': 'topic', 'teacher': teacher.id}, {'topic': 'topic', 'teacher': student.id}]
+    response = auth_client.post(url, data=payload, format='json')
+    assert response.status_code == 400
+    assert response.json()[1]['teacher']
+    assert not Lecture.objects.exists()
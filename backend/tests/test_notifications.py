@@ -0,0 +1,40 @@
+import json
+
+from api.v1.notifications import BulkNotificationSenderV1, NotificationSenderV1, get_course_groups
+from project.constants import EventEnum
+
+
+def test_course_groups_follow_enrollment(course, teacher, student, another_student):
+    course.students.add(student)
+    assert get_course_groups(teacher.id) == {f"course_v1_{course.id}", f"course_staff_v1_{course.id}"}
+    assert get_course_groups(student.id) == {f"course_v1_{course.id}"}
+    assert get_course_groups(another_student.id) == set()
+    course.students.remove(student)
+    assert get_course_groups(student.id) == set()
+
+
+def test_new_course_is_sent_to_members(course, teacher, student):
+    course.students.add(student)
+    sender = NotificationSenderV1(instance=course, event=EventEnum.CREATE)
+    assert sorted(sender.get_groups()) == sorted([f"user_v1_{teacher.id}", f"user_v1_{student.id}"])
+
+
+def test_course_update_is_sent_to_course_group(course):
+    sender = NotificationSenderV1(instance=course, event=EventEnum.UPDATE)
+    assert sender.get_groups() == [f"course_v1_{course.id}"]
+
+
+def test_submission_is_sent_to_staff_and_author(submission, homework, student):
+    sender = NotificationSenderV1(instance=submission, event=EventEnum.CREATE)
+    assert sender.get_groups() == [f"course_staff_v1_{homework.lecture.course_id}", f"user_v1_{student.id}"]
+
+
+def test_bulk_created_objects_are_sent_as_one_notification(homework, submission):
+    sender = BulkNotificationSenderV1(instance=[homework])
+    assert sender.get_groups() == [f"course_v1_{homework.lecture.course_id}"]
+    message = json.loads(sender.encode())
+    assert message["event"] == "bulk_create"
+    assert message["object_name"] == "homework"
+    assert [obj["id"] for obj in message["obj"]] == [homework.id]
+    sender = BulkNotificationSenderV1(instance=[submission])
+    assert sender.get_groups() == [f"course_staff_v1_{homework.lecture.course_id}", f"user_v1_{submission.author_id}"]
@@ -2,6 +2,7 @@ import pytest
 from django.contrib.auth import get_user_model
 from rest_framework import status
 
+from api.v1.pagination import IdCursorPagination
 from courses.models import Submission
 
 User = get_user_model()
@@ -106,3 +107,78 @@ def test_delete_own_submission_by_student(auth_client, homework, submission):
     response = auth_client.delete(url, payload)
     assert response.status_code == status.HTTP_204_NO_CONTENT
     assert not Submission.objects.filter(id=submission.id).exists()
+
+
+@pytest.mark.parametrize("auth_client", ["student"], indirect=True)
+def test_submissions_query_count(auth_client, homework, submission, django_assert_num_queries):
+    url = f"/api/v1/homeworks/{homework.id}/submissions/"
+    with django_assert_num_queries(3):
+        response = auth_client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    with django_assert_num_queries(7):
+        response = auth_client.post(url, {"text": "string"})
+    assert response.status_code == status.HTTP_201_CREATED
+
+
+@pytest.mark.parametrize("auth_client", ["student"], indirect=True)
+def test_bulk_create_submissions(auth_client, homework, student, django_assert_num_queries):
+    url = f"/api/v1/homeworks/{homework.id}/submissions/bulk/"
+    payload = [{"text": f"answer {i}"} for i in range(20)]
+    with django_assert_num_queries(6):
+        response = auth_client.post(url, payload, format="json")
+    assert response.status_code == status.HTTP_201_CREATED
+    assert {item["author"] for item in response.data} == {student.id}
+    assert Submission.objects.filter(homework=homework, author=student).count() == 20
+
+
+@pytest.mark.parametrize("auth_client", ["teacher"], indirect=True)
+def test_submissions_cursor_pagination(auth_client, homework, student, monkeypatch, django_assert_num_queries):
+    Submission.objects.bulk_create(Submission(text=str(i), author=student, homework=homework) for i in range(25))
+    monkeypatch.setattr(IdCursorPagination, "page_size", 10)
+    url = f"/api/v1/homeworks/{homework.id}/submissions/"
+    ids, pages = [], 0
+    while url:
+        pages += 1
+        with django_assert_num_queries(3):
+            response = auth_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert "count" not in response.data
+        ids += [item["id"] for item in response.data["results"]]
+        url = response.data["next"]
+    assert pages == 3
+    assert ids == list(homework.submissions.order_by("id").values_list("id", flat=True))
+    response = auth_client.get(f"/api/v1/homeworks/{homework.id}/submissions/", {"page": 1})
+    assert response.data["count"] == 25
+
+
+@pytest.mark.parametrize("auth_client", ["teacher"], indirect=True)
+def test_submissions_sparse_fields(auth_client, homework, submission, grade, django_assert_num_queries):
+    url = f"/api/v1/homeworks/{homework.id}/submissions/"
+    with django_assert_num_queries(3) as captured:
+        response = auth_client.get(url, {"fields": "id,grade"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["results"][0].keys() == {"id", "grade"}
+    assert set(response.data["results"][0]["grade"]) == {"id", "author", "score", "created_at", "updated_at"}
+    assert '"courses_submission"."text"' not in captured[2]["sql"]
+
+    with django_assert_num_queries(3) as captured:
+        response = auth_client.get(url, {"omit": "grade,text"})
+    assert response.data["results"][0].keys() == {"id", "author", "homework", "created_at", "updated_at"}
+    assert "courses_grade" not in captured[2]["sql"]
+
+
+@pytest.mark.parametrize("auth_client", ["teacher"], indirect=True)
+def test_submissions_conditional_get(auth_client, homework, submission, grade, django_assert_num_queries):
+    url = f"/api/v1/homeworks/{homework.id}/submissions/"
+    etag = auth_client.get(url)["ETag"]
+    with django_assert_num_queries(2):
+        response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    grade.score = 2
+    grade.save()
+    response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response["ETag"] != etag
+    response = auth_client.get(f"{url}{submission.id}/")
+    response = auth_client.get(f"{url}{submission.id}/", HTTP_IF_NONE_MATCH=response["ETag"])
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
@@ -1,6 +1,10 @@
 import pytest
+from asgiref.sync import async_to_sync
 from django.contrib.auth import get_user_model
 from django.core.exceptions import FieldDoesNotExist
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core import auth_middleware
 
 pytestmark = pytest.mark.django_db
 
@@ -30,3 +34,30 @@ def test_registration_with_uncorrect_role(anon_client, role):
     payload = {"email": "user@example.com", "username": "string", "password": "VUnTDBAVmFYKeRP3XRo", "role": role}
     response = anon_client.post(url, data=payload, format="json")
     assert response.status_code == 400
+
+
+def test_websocket_user_is_cached_until_saved(student, monkeypatch):
+    loaded = []
+
+    async def get_user_snapshot(user_id):
+        loaded.append(user_id)
+        return student
+
+    monkeypatch.setattr(auth_middleware, "get_user_snapshot", get_user_snapshot)
+    token = str(AccessToken.for_user(student))
+    auth_middleware.user_cache.clear()
+    assert async_to_sync(auth_middleware.get_user_from_token)(token) == student
+    assert async_to_sync(auth_middleware.get_user_from_token)(token) == student
+    assert loaded == [student.id]
+    student.save()
+    assert async_to_sync(auth_middleware.get_user_from_token)(token) == student
+    assert loaded == [student.id, student.id]
+
+
+def test_websocket_user_from_claims(student, settings, django_assert_num_queries):
+    settings.WEBSOCKET_AUTH_FROM_CLAIMS = True
+    token = str(AccessToken.for_user(student))
+    with django_assert_num_queries(0):
+        user = async_to_sync(auth_middleware.get_user_from_token)(token)
+    assert user.is_authenticated
+    assert int(user.id) == student.id
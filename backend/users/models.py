@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
-from simple_history.models import HistoricalRecords
+
+from core.history import BufferedHistoricalRecords
 
 
 class CustomUser(AbstractUser):
@@ -11,7 +12,7 @@ class CustomUser(AbstractUser):
         STUDENT = 'STUDENT', 'Student'
 
     role = models.CharField(max_length=50, choices=Role, verbose_name='Role')
-    history = HistoricalRecords()
+    history = BufferedHistoricalRecords()
 
     def __str__(self):
         return self.username